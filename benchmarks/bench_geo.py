@@ -0,0 +1,48 @@
+"""
+Benchmark geolocation and categorization against a local geo stand-in
+
+Usage: python -m benchmarks.bench_geo [num_ips]
+"""
+
+import os
+import sys
+import time
+import random
+
+os.environ.setdefault("IRAN_IP_RANGES_URL", "")
+os.environ.setdefault("IRAN_IPV6_RANGES_URL", "")
+
+from src.filter import ConfigFilter
+from src.geo import GeoChain, IpInfoProvider
+from benchmarks.standins import MockGeoServer
+
+
+def synthetic_configs(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    configs = []
+    for idx in range(count):
+        ip = f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        configs.append({'type': 'vless', 'address': ip, 'port': '443', 'id': str(idx),
+                        'original': f"vless://{idx}@{ip}:443#bench"})
+    return configs
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    configs = synthetic_configs(count)
+
+    with MockGeoServer() as server:
+        provider = IpInfoProvider(server.url, batch=True)
+        filter_obj = ConfigFilter(geo=GeoChain([provider]))
+
+        start = time.perf_counter()
+        categorized = filter_obj.filter_and_categorize(configs)
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(c) for c in categorized.values())
+    print(f"Categorized {total}/{count} configs into {len(categorized)} countries "
+          f"in {elapsed:.2f}s ({server.request_count} geo requests)")
+
+
+if __name__ == "__main__":
+    main()
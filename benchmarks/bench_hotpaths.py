@@ -0,0 +1,264 @@
+"""
+Benchmark the hot paths on synthetic corpora and write the results as JSON
+
+Usage: python -m benchmarks.bench_hotpaths [--scales 1000,10000,100000] [--repeat 3]
+                                           [--only parse,render] [--output FILE] [--compare OLD.json]
+
+Each benchmark runs `repeat` times on a fresh copy of its input and the
+fastest run is kept. Results go to benchmarks/results/hotpaths-<time>.json
+unless --output is given; --compare prints the change against an earlier file.
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("IRAN_IP_RANGES_URL", "")
+os.environ.setdefault("IRAN_IPV6_RANGES_URL", "")
+
+from bs4 import BeautifulSoup
+
+from benchmarks.corpus import cidr_table, mixed_links, random_ip, subscription_text, telegram_page
+from src.collector import ConfigCollector
+from src.filter import ConfigFilter
+from src.generator import OutputGenerator
+from src.geo import FileGeoProvider, GeoChain
+from src.iprange import IPRangeIndex
+from src.parser import ConfigParser
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+# Links per generated Telegram page (what one t.me/s/ fetch returns is ~20 messages)
+LINKS_PER_PAGE = 60
+
+
+class Corpus:
+    """Everything the benchmarks need at one scale, built once"""
+
+    def __init__(self, scale: int, seed: int = 1):
+        self.scale = scale
+        self.links = mixed_links(scale, seed=seed)
+        self.subscription = subscription_text(self.links)
+        self.pages = [telegram_page(self.links[i:i + LINKS_PER_PAGE], f"channel{i}", seed=i)
+                      for i in range(0, scale, LINKS_PER_PAGE)]
+        self.parsed = [c for c in map(ConfigParser.parse_config, self.links) if c]
+
+        rng = random.Random(seed)
+        self.ips = [random_ip(rng, v6_share=0.5) for _ in range(scale)]
+        self.table = cidr_table(scale, seed=seed)
+
+        # what the generator receives: located, deduplicated configs of one country
+        self.located = ConfigFilter(geo=GeoChain([])).remove_duplicates(copy.deepcopy(self.parsed))
+        for config in self.located:
+            config['country'] = 'DE'
+            config['ip'] = config.get('address', '').strip('[]')
+            config['cdn'] = None
+
+
+def bench_extract_subscription(corpus: Corpus):
+    collector = ConfigCollector()
+    return lambda: collector._extract_configs_from_text(corpus.subscription), len(corpus.links)
+
+
+def bench_extract_telegram(corpus: Corpus):
+    collector = ConfigCollector()
+
+    def run():
+        for page in corpus.pages:
+            text = BeautifulSoup(page, 'html.parser').get_text(separator=' ')
+            collector._extract_configs_from_text(text)
+    return run, len(corpus.links)
+
+
+def bench_parse(corpus: Corpus):
+    return lambda: [ConfigParser.parse_config(link) for link in corpus.links], len(corpus.links)
+
+
+def _filter_with_tables(corpus: Corpus, directory: str) -> ConfigFilter:
+    """ConfigFilter whose Iran, CDN and geo tables all hold `scale` random ranges"""
+    geo_file = os.path.join(directory, "geo.csv")
+    with open(geo_file, 'w', encoding='utf-8') as f:
+        f.write("\n".join(f"{cidr},{country}" for cidr, country in corpus.table))
+
+    filter_obj = ConfigFilter(geo=GeoChain([FileGeoProvider(geo_file)]))
+    filter_obj.iran_ips = IPRangeIndex((cidr, "IR") for cidr, _ in corpus.table[::2])
+    filter_obj.cdn_ranges = IPRangeIndex((cidr, "cloudflare") for cidr, _ in corpus.table[1::2])
+    # build the lookup arrays outside the timed part
+    filter_obj.iran_ips.lookup("127.0.0.1")
+    filter_obj.cdn_ranges.lookup("127.0.0.1")
+    filter_obj.geo.providers[0].ranges.lookup("127.0.0.1")
+    return filter_obj
+
+
+def bench_locate(corpus: Corpus, directory: str):
+    """Iran check, geo lookup and CDN detection of resolved IPs, as the filter and pipeline run them"""
+    filter_obj = _filter_with_tables(corpus, directory)
+    resolved = [(ip, {}) for ip in corpus.ips]
+    return lambda: filter_obj.locate(resolved), len(resolved)
+
+
+def bench_detect_cdn(corpus: Corpus, directory: str):
+    filter_obj = _filter_with_tables(corpus, directory)
+    return lambda: [filter_obj.detect_cdn(ip, '') for ip in corpus.ips], len(corpus.ips)
+
+
+def bench_remove_duplicates(corpus: Corpus):
+    filter_obj = ConfigFilter(geo=GeoChain([]))
+    configs = copy.deepcopy(corpus.parsed)
+    return lambda: filter_obj.remove_duplicates(configs), len(configs)
+
+
+def bench_rebuild_cold(corpus: Corpus):
+    generator = OutputGenerator()
+    configs = copy.deepcopy(corpus.located)
+    return lambda: generator._rebuild_configs_with_standard_names(configs, 'DE'), len(configs)
+
+
+def bench_rebuild_warm(corpus: Corpus):
+    warmup = OutputGenerator()
+    warmup._rebuild_configs_with_standard_names(copy.deepcopy(corpus.located), 'DE')
+    generator = OutputGenerator(rebuild_cache=warmup.rebuild_cache_used)
+    configs = copy.deepcopy(corpus.located)
+    return lambda: generator._rebuild_configs_with_standard_names(configs, 'DE'), len(configs)
+
+
+def bench_render(corpus: Corpus, directory: str):
+    """All of a country's files (json, txt, subscription, shards, client formats) into an empty tree"""
+    os.chdir(directory)
+    generator = OutputGenerator()
+    configs = copy.deepcopy(corpus.located)
+    return lambda: generator._generate_country_outputs('DE', configs), len(configs)
+
+
+def bench_render_unchanged(corpus: Corpus, directory: str):
+    """Same as render, but every file is already up to date (the skip path of a quiet run)"""
+    os.chdir(directory)
+    OutputGenerator()._generate_country_outputs('DE', copy.deepcopy(corpus.located))
+    generator = OutputGenerator()
+    configs = copy.deepcopy(corpus.located)
+    return lambda: generator._generate_country_outputs('DE', configs), len(configs)
+
+
+# name -> (setup function, whether it needs a scratch directory)
+BENCHMARKS = {
+    'extract_subscription': (bench_extract_subscription, False),
+    'extract_telegram': (bench_extract_telegram, False),
+    'parse': (bench_parse, False),
+    'locate': (bench_locate, True),
+    'detect_cdn': (bench_detect_cdn, True),
+    'remove_duplicates': (bench_remove_duplicates, False),
+    'rebuild_cold': (bench_rebuild_cold, False),
+    'rebuild_warm': (bench_rebuild_warm, False),
+    'render': (bench_render, True),
+    'render_unchanged': (bench_render_unchanged, True),
+}
+
+
+def run_benchmark(name: str, corpus: Corpus, repeat: int) -> dict:
+    setup, needs_directory = BENCHMARKS[name]
+    cwd = os.getcwd()
+    times = []
+    items = 0
+
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                run, items = setup(corpus, directory) if needs_directory else setup(corpus)
+                start = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - start)
+            finally:
+                os.chdir(cwd)
+
+    best = min(times)
+    return {
+        'bench': name,
+        'scale': corpus.scale,
+        'items': items,
+        'seconds': round(best, 6),
+        'per_item_us': round(best / max(items, 1) * 1e6, 3),
+        'items_per_s': round(items / best) if best else None,
+        'runs': [round(t, 6) for t in times],
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(baseline_path: str, results: list):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['bench'], r['scale']): r for r in json.load(f)['results']}
+
+    print(f"\nCompared with {baseline_path} (time ratio, <1 is faster):")
+    for result in results:
+        old = baseline.get((result['bench'], result['scale']))
+        if old and old['seconds']:
+            ratio = result['seconds'] / old['seconds']
+            print(f"  {result['bench']:<22} {result['scale']:>7}  {old['seconds']:9.4f}s -> "
+                  f"{result['seconds']:9.4f}s  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths on synthetic corpora")
+    parser.add_argument('--scales', default=",".join(map(str, DEFAULT_SCALES)))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', default="", help="comma-separated benchmark names")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default="")
+    parser.add_argument('--compare', default="", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    names = [n for n in args.only.split(',') if n] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)} (choose from {', '.join(BENCHMARKS)})")
+
+    results = []
+    for scale in (int(s) for s in args.scales.split(',') if s):
+        start = time.perf_counter()
+        corpus = Corpus(scale, seed=args.seed)
+        print(f"Corpus of {scale} links built in {time.perf_counter() - start:.1f}s")
+        for name in names:
+            result = run_benchmark(name, corpus, max(1, args.repeat))
+            results.append(result)
+            print(f"  {name:<22} {result['items']:>7} items  {result['seconds']:9.4f}s  "
+                  f"{result['per_item_us']:9.2f} us/item")
+
+    report = {
+        'created': datetime.utcnow().isoformat(),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"hotpaths-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
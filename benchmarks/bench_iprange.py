@@ -0,0 +1,61 @@
+"""
+Benchmark dual-stack range index lookups as the v4/v6 tables grow
+
+Usage: python -m benchmarks.bench_iprange
+"""
+
+import ipaddress
+import random
+import time
+
+from src.iprange import IPRangeIndex
+
+TABLE_SIZES = [1000, 10000, 100000]
+LOOKUPS = 50000
+
+
+def random_table(size: int, rng: random.Random) -> list:
+    ranges = []
+    for idx in range(size):
+        if idx % 2:
+            prefix = rng.randint(32, 64)
+            network = ipaddress.IPv6Network((rng.getrandbits(128), prefix), strict=False)
+        else:
+            prefix = rng.randint(12, 28)
+            network = ipaddress.IPv4Network((rng.getrandbits(32), prefix), strict=False)
+        ranges.append((str(network), "XX"))
+    return ranges
+
+
+def random_ips(count: int, rng: random.Random) -> list:
+    ips = []
+    for idx in range(count):
+        if idx % 2:
+            ips.append(str(ipaddress.IPv6Address(rng.getrandbits(128))))
+        else:
+            ips.append(str(ipaddress.IPv4Address(rng.getrandbits(32))))
+    return ips
+
+
+def main():
+    rng = random.Random(42)
+    ips = random_ips(LOOKUPS, rng)
+
+    for size in TABLE_SIZES:
+        index = IPRangeIndex(random_table(size, rng))
+
+        start = time.perf_counter()
+        index.lookup(ips[0])
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for ip in ips:
+            index.lookup(ip)
+        elapsed = time.perf_counter() - start
+
+        print(f"{size:>7} ranges: build {build * 1000:8.1f} ms, "
+              f"lookup {elapsed / LOOKUPS * 1e6:6.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Reproducible synthetic corpora: mixed-protocol links, Telegram channel pages, CIDR tables
+
+Everything is generated from a seed, so the same arguments always give the same corpus.
+"""
+
+import base64
+import html
+import ipaddress
+import json
+import random
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+from benchmarks.standins import SYNTHETIC_COUNTRIES
+
+# Relative share of each protocol, roughly what the public sources carry
+PROTOCOL_MIX = [("vless", 40), ("vmess", 20), ("trojan", 15), ("ss", 15),
+                ("hysteria2", 5), ("tuic", 3), ("ssr", 2)]
+
+NETWORKS = ["tcp", "ws", "grpc", "httpupgrade", "xhttp"]
+SNIS = ["www.speedtest.net", "cdn.example.com", "update.microsoft.com", "dl.google.com"]
+FINGERPRINTS = ["chrome", "firefox", "safari", "randomized"]
+
+
+def random_ip(rng: random.Random, v6_share: float = 0.1) -> str:
+    if rng.random() < v6_share:
+        return str(ipaddress.IPv6Address((0x2001 << 112) | rng.getrandbits(100)))
+    return f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def _endpoint(rng: random.Random, endpoints: Optional[List[Tuple[str, int]]]) -> Tuple[str, int]:
+    if endpoints:
+        ip, port = rng.choice(endpoints)
+    else:
+        ip, port = random_ip(rng), rng.choice([443, 443, 8443, 2053, 80, rng.randint(1024, 65535)])
+    return (f"[{ip}]" if ':' in ip else ip), port
+
+
+def _uuid(rng: random.Random) -> str:
+    value = f"{rng.getrandbits(128):032x}"
+    return f"{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}"
+
+
+def _name(rng: random.Random, idx: int) -> str:
+    return quote(f"{rng.choice(['@channel', 'free', 'vpn', '🔥 fast'])}-{idx}", safe='')
+
+
+def make_link(protocol: str, idx: int, rng: random.Random,
+              endpoints: Optional[List[Tuple[str, int]]] = None) -> str:
+    """One share link of `protocol`, at a random endpoint or one of `endpoints` (ip, port)"""
+    host, port = _endpoint(rng, endpoints)
+    network = rng.choice(NETWORKS)
+    sni = rng.choice(SNIS)
+    name = _name(rng, idx)
+
+    if protocol == "vless":
+        security = rng.choice(["tls", "reality", "none"])
+        params = f"type={network}&security={security}&encryption=none"
+        if security != "none":
+            params += f"&sni={sni}&fp={rng.choice(FINGERPRINTS)}"
+        if security == "reality":
+            params += f"&pbk={base64.urlsafe_b64encode(rng.randbytes(32)).decode().rstrip('=')}&sid={rng.getrandbits(32):08x}"
+        if network in ("ws", "httpupgrade", "xhttp"):
+            params += f"&path=%2F{rng.getrandbits(24):06x}&host={sni}"
+        elif network == "grpc":
+            params += f"&serviceName=grpc{idx % 7}"
+        return f"vless://{_uuid(rng)}@{host}:{port}?{params}#{name}"
+
+    if protocol == "vmess":
+        data = {"v": "2", "ps": f"vmess-{idx}", "add": host.strip('[]'), "port": str(port), "id": _uuid(rng),
+                "aid": "0", "scy": "auto", "net": network, "type": "none", "host": sni,
+                "path": f"/{rng.getrandbits(24):06x}", "tls": rng.choice(["tls", ""]), "sni": sni}
+        return "vmess://" + base64.b64encode(json.dumps(data).encode()).decode()
+
+    if protocol == "trojan":
+        return f"trojan://{rng.getrandbits(64):016x}@{host}:{port}?security=tls&sni={sni}&type={network}#{name}"
+
+    if protocol == "ss":
+        method = rng.choice(["aes-256-gcm", "chacha20-ietf-poly1305", "2022-blake3-aes-128-gcm"])
+        userinfo = base64.urlsafe_b64encode(f"{method}:{rng.getrandbits(64):016x}".encode()).decode().rstrip('=')
+        return f"ss://{userinfo}@{host}:{port}#{name}"
+
+    if protocol == "hysteria2":
+        return f"hysteria2://{rng.getrandbits(64):016x}@{host}:{port}?sni={sni}&insecure=1&obfs=salamander#{name}"
+
+    if protocol == "tuic":
+        return (f"tuic://{_uuid(rng)}:{rng.getrandbits(48):012x}@{host}:{port}"
+                f"?sni={sni}&alpn=h3&congestion_control=bbr#{name}")
+
+    # ssr
+    password = base64.urlsafe_b64encode(f"{rng.getrandbits(48):012x}".encode()).decode().rstrip('=')
+    body = f"{host.strip('[]')}:{port}:origin:aes-256-cfb:plain:{password}/?remarks={base64.urlsafe_b64encode(b'ssr').decode()}"
+    return "ssr://" + base64.urlsafe_b64encode(body.encode()).decode().rstrip('=')
+
+
+def mixed_links(count: int, seed: int = 1, duplicate_share: float = 0.1,
+                endpoints: Optional[List[Tuple[str, int]]] = None) -> List[str]:
+    """`count` links in PROTOCOL_MIX proportions; `duplicate_share` of them repeat an earlier
+    endpoint with a different name, like reposts across channels"""
+    rng = random.Random(seed)
+    protocols = [p for p, _ in PROTOCOL_MIX]
+    weights = [w for _, w in PROTOCOL_MIX]
+    links: List[str] = []
+
+    for idx in range(count):
+        if links and rng.random() < duplicate_share:
+            original = rng.choice(links)
+            if '#' in original:
+                links.append(original.split('#', 1)[0] + f"#repost-{idx}")
+                continue
+        links.append(make_link(rng.choices(protocols, weights)[0], idx, rng, endpoints))
+
+    return links
+
+
+def telegram_page(links: List[str], channel: str = "channel", seed: int = 1,
+                  per_message: int = 3) -> str:
+    """A t.me/s/<channel> style page: messages of chatter with links inline, as the collector sees it"""
+    rng = random.Random(seed)
+    chatter = ["🔥 New servers", "Speed test ✅", "Join us", "کانفیگ جدید", "رایگان", "Updated daily"]
+    messages = []
+
+    for start in range(0, len(links), per_message):
+        body = "<br/>".join(html.escape(link) for link in links[start:start + per_message])
+        messages.append(
+            f'<div class="tgme_widget_message_wrap"><div class="tgme_widget_message" data-post="{channel}/{start}">'
+            f'<div class="tgme_widget_message_text">{html.escape(rng.choice(chatter))}<br/>{body}'
+            f'<br/>#v2ray #{channel}</div><span class="tgme_widget_message_views">{rng.randint(100, 99999)}</span>'
+            f'</div></div>'
+        )
+
+    return (f'<!DOCTYPE html><html><head><title>{channel} – Telegram</title></head><body>'
+            f'<section class="tgme_channel_history">{"".join(messages)}</section></body></html>')
+
+
+def subscription_text(links: List[str], encoded: bool = False) -> str:
+    """A raw subscription file (sub/mix style), optionally base64 encoded"""
+    text = "\n".join(links) + "\n"
+    return base64.b64encode(text.encode()).decode() if encoded else text
+
+
+def cidr_table(size: int, seed: int = 1, v6_share: float = 0.5,
+               labels: Tuple[str, ...] = tuple(SYNTHETIC_COUNTRIES)) -> List[Tuple[str, str]]:
+    """`size` random (cidr, label) ranges, half IPv6 by default"""
+    rng = random.Random(seed)
+    table = []
+    for idx in range(size):
+        if rng.random() < v6_share:
+            network = ipaddress.IPv6Network((rng.getrandbits(128), rng.randint(32, 64)), strict=False)
+        else:
+            network = ipaddress.IPv4Network((rng.getrandbits(32), rng.randint(12, 28)), strict=False)
+        table.append((str(network), labels[idx % len(labels)]))
+    return table
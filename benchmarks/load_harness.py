@@ -0,0 +1,267 @@
+"""
+Offline end-to-end load test: the real main.py against local stand-ins at N times today's volume
+
+Usage: python -m benchmarks.load_harness [--scales 1,10,100] [--runs 1] [--streaming]
+                                         [--listeners 200] [--alive-share 0.3] [--output FILE]
+
+For every scale the harness starts, in this process:
+  - a MockSourceServer with 20*scale t.me/s/ channel pages (LINKS_PER_CHANNEL
+    links each), the Iran range list, and --repos GitHub-style subscription files
+  - a MockGeoServer (ipinfo batch API) giving every IP a synthetic country
+  - a fleet of TCP/TLS listeners, each on its own loopback address (127.0.x.y)
+
+Links point at those listeners (--alive-share of them) or at closed ports
+on other loopback addresses, so probes succeed or get refused quickly.
+main.py then runs in a subprocess in a scratch directory, with SOURCES_FILE,
+GITHUB_RAW_BASE, GEO_PROVIDERS=mock and the Iran range URLs aimed at the
+stand-ins. Wall time, throughput, peak RSS and the run's
+reports/run_report.json stage timings are written to
+benchmarks/results/load-<time>.json.
+
+With --runs 2 or more, later runs reuse the scratch directory's state/ and cache/, so
+they show the steady-state cost of a run that already has history.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.corpus import mixed_links, subscription_text, telegram_page
+from benchmarks.standins import LocalTCPServer, LocalTLSServer, MockGeoServer, MockSourceServer, make_self_signed_cert
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Today's volume: the 20 configured Telegram channels with roughly 40 links on each page
+BASE_CHANNELS = 20
+LINKS_PER_CHANNEL = 40
+
+# Loopback ranges: listeners live in 127.0.0.0/16, dead endpoints in 127.2-127.254,
+# and the stand-in Iran list covers 127.1.0.0/16 so some configs land in IR
+IRAN_TEST_RANGE = "127.1.0.0/16"
+
+
+def loopback_address(idx: int, second_octet: int = 0) -> str:
+    return f"127.{second_octet}.{idx // 250 % 256}.{idx % 250 + 1}"
+
+
+class LoadEnvironment:
+    """All stand-ins for one scale; use as a context manager"""
+
+    def __init__(self, scale: int, listeners: int, alive_share: float, repos: int,
+                 repo_links: int, source_delay: float, seed: int = 1):
+        self.scale = scale
+        self.listener_count = listeners
+        self.alive_share = alive_share
+        self.repos = repos
+        self.repo_links = repo_links
+        self.seed = seed
+        self.sources = MockSourceServer(delay=source_delay)
+        self.geo = MockGeoServer()
+        self.listeners = []
+        self.links = []
+        self.source_lists = {}
+
+    def __enter__(self):
+        self.sources.start()
+        self.geo.start()
+
+        cert_path, key_path = make_self_signed_cert()
+        for idx in range(self.listener_count):
+            # every fourth listener speaks TLS, the rest accept plain TCP; some sit in the "Iran" range
+            host = loopback_address(idx, second_octet=1 if idx % 10 == 0 else 0)
+            if idx % 4 == 0:
+                server = LocalTLSServer(host, cert_path=cert_path, key_path=key_path)
+            else:
+                server = LocalTCPServer(host)
+            self.listeners.append(server.start())
+
+        self._publish()
+        return self
+
+    def __exit__(self, *exc):
+        # each stop() waits out a serve_forever poll, so stop them all at once
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            list(executor.map(lambda server: server.stop(), self.listeners))
+        self.geo.stop()
+        self.sources.stop()
+
+    def _publish(self):
+        rng = random.Random(self.seed)
+        channel_count = BASE_CHANNELS * self.scale
+        total = channel_count * LINKS_PER_CHANNEL + self.repos * self.repo_links
+        alive = int(total * self.alive_share)
+
+        alive_endpoints = [(server.host, server.port) for server in self.listeners]
+        # closed ports on addresses nothing listens on: refused right away
+        dead_endpoints = [(loopback_address(idx, second_octet=2 + idx // 64000 % 252), 1 + idx % 65000)
+                          for idx in range(total - alive)]
+
+        links = (mixed_links(alive, seed=self.seed, endpoints=alive_endpoints) +
+                 mixed_links(total - alive, seed=self.seed + 1, endpoints=dead_endpoints))
+        rng.shuffle(links)
+        self.links = links
+
+        channels = []
+        for idx in range(channel_count):
+            chunk = links[idx * LINKS_PER_CHANNEL:(idx + 1) * LINKS_PER_CHANNEL]
+            channels.append(self.sources.add(f"/s/channel{idx}", telegram_page(chunk, f"channel{idx}", seed=idx),
+                                             "text/html; charset=utf-8"))
+
+        repos = []
+        offset = channel_count * LINKS_PER_CHANNEL
+        for idx in range(self.repos):
+            chunk = links[offset + idx * self.repo_links:offset + (idx + 1) * self.repo_links]
+            self.sources.add(f"/owner{idx}/configs/main/sub/mix", subscription_text(chunk, encoded=idx % 2 == 1))
+            repos.append(f"owner{idx}/configs")
+
+        self.iran_url = self.sources.add("/iran/ipv4.cidr", IRAN_TEST_RANGE + "\n")
+        self.source_lists = {
+            'telegram_channels': channels,
+            'github_repos': repos,
+            'public_apis': [],
+            'web_scrape_urls': [],
+        }
+
+    def environment(self, workdir: str, streaming: bool) -> dict:
+        sources_file = os.path.join(workdir, "sources.json")
+        with open(sources_file, 'w', encoding='utf-8') as f:
+            json.dump(self.source_lists, f)
+
+        env = dict(os.environ)
+        env.update({
+            'SOURCES_FILE': sources_file,
+            'GITHUB_RAW_BASE': self.sources.url,
+            'GEO_PROVIDERS': 'mock',
+            'GEO_MOCK_URL': self.geo.url,
+            'IRAN_IP_RANGES_URL': self.iran_url,
+            'IRAN_IPV6_RANGES_URL': '',
+            'STREAMING_PIPELINE': '1' if streaming else '0',
+            'PYTHONUNBUFFERED': '1',
+        })
+        return env
+
+
+def run_pipeline(env: dict, workdir: str, run: int) -> dict:
+    """Run main.py once in `workdir` and collect timings from its run report"""
+    log_path = os.path.join(workdir, f"run{run}.log")
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        process = subprocess.run([sys.executable, os.path.join(ROOT, "main.py")], cwd=workdir, env=env,
+                                 stdout=log, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'run': run,
+        'exit_code': process.returncode,
+        'seconds': round(elapsed, 3),
+        # max over every child so far, so later runs report at least the earlier peaks
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        'log': log_path,
+    }
+    if process.returncode != 0:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            result['log_tail'] = f.read()[-2000:]
+        return result
+
+    try:
+        with open(os.path.join(workdir, "reports", "run_report.json"), 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError) as e:
+        result['report_error'] = str(e)
+        return result
+
+    def counters(name):
+        return {','.join(f"{k}={v}" for k, v in sorted(entry['labels'].items())) or 'total': entry['value']
+                for entry in report['counters'].get(name, [])}
+
+    def seconds(name):
+        return {','.join(f"{k}={v}" for k, v in sorted(entry['labels'].items())) or 'total': entry['sum']
+                for entry in report['timers'].get(name, [])}
+
+    result['configs'] = counters('configs_total')
+    result['stage_seconds'] = seconds('stage_seconds')
+    result['pipeline_stage_seconds'] = seconds('pipeline_stage_seconds')
+    result['fetches'] = counters('fetches_total')
+    result['endpoints_probed'] = counters('endpoints_probed_total')
+    collected = result['configs'].get('stage=collected', 0)
+    result['configs_per_s'] = round(collected / elapsed, 1) if elapsed else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test against local stand-ins")
+    parser.add_argument('--scales', default="1,10,100", help="multiples of today's volume")
+    parser.add_argument('--runs', type=int, default=1, help="consecutive runs per scale sharing state/")
+    parser.add_argument('--streaming', action='store_true', help="run with STREAMING_PIPELINE=1")
+    parser.add_argument('--listeners', type=int, default=200, help="live proxy endpoints")
+    parser.add_argument('--alive-share', type=float, default=0.3, help="share of links on live endpoints")
+    parser.add_argument('--repos', type=int, default=0, help="GitHub-style subscription sources")
+    parser.add_argument('--repo-links', type=int, default=1000, help="links per subscription source")
+    parser.add_argument('--source-delay', type=float, default=0.0, help="seconds each source request waits")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directories")
+    parser.add_argument('--output', default="")
+    args = parser.parse_args()
+
+    results = []
+    for scale in (int(s) for s in args.scales.split(',') if s):
+        with LoadEnvironment(scale, args.listeners, args.alive_share, args.repos, args.repo_links,
+                             args.source_delay, seed=args.seed) as environment:
+            workdir = tempfile.mkdtemp(prefix=f"load-x{scale}-")
+            env = environment.environment(workdir, args.streaming)
+            print(f"x{scale}: {len(environment.links)} links on "
+                  f"{len(environment.source_lists['telegram_channels'])} channels and {args.repos} repos "
+                  f"({workdir})")
+
+            runs = []
+            for run in range(1, max(1, args.runs) + 1):
+                result = run_pipeline(env, workdir, run)
+                runs.append(result)
+                if result['exit_code'] != 0:
+                    print(f"  run {run} failed with exit code {result['exit_code']}:\n{result.get('log_tail', '')}")
+                    break
+                stages = ", ".join(f"{k.split('=', 1)[-1]} {v:.1f}s" for k, v in result['stage_seconds'].items())
+                print(f"  run {run}: {result['seconds']:.1f}s, {result['configs_per_s']} configs/s, "
+                      f"peak RSS {result['peak_rss_mb']} MB ({stages})")
+
+            results.append({
+                'scale': scale,
+                'links': len(environment.links),
+                'channels': len(environment.source_lists['telegram_channels']),
+                'repos': args.repos,
+                'listeners': args.listeners,
+                'alive_share': args.alive_share,
+                'source_requests': environment.sources.request_count,
+                'geo_requests': environment.geo.request_count,
+                'workdir': workdir if args.keep else None,
+                'runs': runs,
+            })
+            if not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created': datetime.utcnow().isoformat(),
+        'mode': 'streaming' if args.streaming else 'staged',
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
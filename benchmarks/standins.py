@@ -0,0 +1,321 @@
+"""
+Local stand-in servers for offline testing and benchmarking
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_COUNTRIES = ["DE", "US", "NL", "FR", "GB", "FI", "TR", "AE", "SG", "JP"]
+
+
+class _StandInServer:
+    """Base class running a ThreadingHTTPServer on a background thread"""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.request_count = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def count_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    def start(self):
+        handler = type('Handler', (self.handler_class,), {'standin': self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.debug(f"{type(self).__name__} listening on {self.url}")
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _GeoHandler(BaseHTTPRequestHandler):
+    standin = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.standin.count_request()
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        if len(parts) == 2 and parts[1] == 'json':
+            country = self.standin.country_for(parts[0])
+            if country:
+                self._send_json({'ip': parts[0], 'country': country})
+                return
+        self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        self.standin.count_request()
+        if self.path.split('?')[0].rstrip('/') != '/batch':
+            self._send_json({'error': 'not found'}, status=404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        keys = json.loads(self.rfile.read(length) or b'[]')
+        results = {}
+        for key in keys[:1000]:
+            country = self.standin.country_for(key.rsplit('/', 1)[0])
+            if country:
+                results[key] = country
+        self._send_json(results)
+
+
+class MockGeoServer(_StandInServer):
+    """ipinfo-compatible stand-in (GET /<ip>/json and POST /batch)
+
+    Countries come from `mapping` when given, otherwise every IP gets a
+    deterministic synthetic country so large runs are reproducible.
+    """
+
+    handler_class = _GeoHandler
+
+    def __init__(self, mapping: Optional[Dict[str, str]] = None, host: str = "127.0.0.1",
+                 port: int = 0):
+        super().__init__(host, port)
+        self.mapping = mapping
+
+    def country_for(self, ip: str) -> Optional[str]:
+        if self.mapping is not None:
+            return self.mapping.get(ip)
+        return SYNTHETIC_COUNTRIES[zlib.crc32(ip.encode('utf-8')) % len(SYNTHETIC_COUNTRIES)]
+
+
+class _SourceHandler(BaseHTTPRequestHandler):
+    standin = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.standin.count_request()
+        if self.standin.delay:
+            time.sleep(self.standin.delay)
+        page = self.standin.pages.get(self.path.split('?')[0])
+        if page is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body, content_type = page
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MockSourceServer(_StandInServer):
+    """Static stand-in for config sources: t.me/s/ channel pages, raw subscription files, range lists
+
+    Pages are registered by path with `add`; every request waits `delay`
+    seconds first to imitate a remote server.
+    """
+
+    handler_class = _SourceHandler
+
+    def __init__(self, delay: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port)
+        self.delay = delay
+        self.pages: Dict[str, tuple] = {}
+
+    def add(self, path: str, body: str, content_type: str = "text/plain; charset=utf-8") -> str:
+        """Serve `body` at `path` and return its full URL (call after start() for the real port)"""
+        path = '/' + path.lstrip('/')
+        self.pages[path] = (body.encode('utf-8'), content_type)
+        return self.url + path
+
+
+def make_self_signed_cert(directory: Optional[str] = None, common_name: str = "localhost") -> tuple:
+    """Create a throwaway self-signed cert/key pair with the openssl CLI"""
+    directory = directory or tempfile.mkdtemp(prefix="standin-tls-")
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", f"/CN={common_name}", "-keyout", key_path, "-out", cert_path],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return cert_path, key_path
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class LocalTCPServer:
+    """TCP listener standing in for a proxy endpoint (accepts and closes)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.accepted = 0
+        self._server = None
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.accepted += 1
+
+    def _handle(self, sock: socket.socket):
+        self._count()
+
+    def start(self):
+        standin = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                standin._handle(self.request)
+
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        server_class = type('Server', (_ThreadingTCPServer,), {'address_family': family})
+        self._server = server_class((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class LocalTLSServer(LocalTCPServer):
+    """TLS listener that completes handshakes and records the SNI it saw"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, cert_path: Optional[str] = None,
+                 key_path: Optional[str] = None, alpn: Optional[list] = None):
+        super().__init__(host, port)
+        if not cert_path or not key_path:
+            cert_path, key_path = make_self_signed_cert()
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(cert_path, key_path)
+        if alpn:
+            self.context.set_alpn_protocols(alpn)
+        self.server_names = []
+        self.context.sni_callback = self._on_sni
+
+    def _on_sni(self, ssl_socket, server_name, context):
+        with self._lock:
+            self.server_names.append(server_name)
+
+    def _handle(self, sock: socket.socket):
+        try:
+            sock.settimeout(5)
+            with self.context.wrap_socket(sock, server_side=True):
+                self._count()
+        except (OSError, ssl.SSLError):
+            pass
+
+
+class LocalUDPServer:
+    """UDP stand-in for QUIC endpoints
+
+    Answers QUIC long-header packets with a Version Negotiation packet and
+    echoes anything else back.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, versions: bytes = b'\x00\x00\x00\x01'):
+        self.host = host
+        self.port = port
+        self.versions = versions
+        self.received = 0
+        self._sock: Optional[socket.socket] = None
+        self._running = False
+
+    def _reply_for(self, data: bytes) -> bytes:
+        if len(data) < 7 or not data[0] & 0x80:
+            return data
+        dcid_len = data[5]
+        dcid = data[6:6 + dcid_len]
+        scid_len = data[6 + dcid_len] if len(data) > 6 + dcid_len else 0
+        scid = data[7 + dcid_len:7 + dcid_len + scid_len]
+        # Version Negotiation: swap the connection IDs and list supported versions
+        return (bytes([0x80]) + b'\x00\x00\x00\x00' + bytes([len(scid)]) + scid
+                + bytes([len(dcid)]) + dcid + self.versions)
+
+    def _serve(self):
+        while self._running:
+            try:
+                data, addr = self._sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.received += 1
+            self._sock.sendto(self._reply_for(data), addr)
+
+    def start(self):
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        self._sock = socket.socket(family, socket.SOCK_DGRAM)
+        self._sock.bind((self.host, self.port))
+        self._sock.settimeout(0.2)
+        self.port = self._sock.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -3,12 +3,22 @@ Main script for collecting, filtering, testing and generating proxy configs
 """
 
 import logging
+from typing import Optional
 from src.collector import ConfigCollector
 from src.parser import ConfigParser
 from src.filter import ConfigFilter
+from src.fingerprint import link_order
 from src.tester import ConnectionTester
 from src.generator import OutputGenerator
-from src.config import TEST_COUNTRIES
+from src.history import TestHistory
+from src.scheduler import TestScheduler
+from src.scoring import QualityScorer
+from src.bloom import DeadSet
+from src.pipeline import StreamingPipeline
+from src.store import ConfigStore
+from src.metrics import METRICS
+from src.config import (DEAD_FAIL_STREAK, INCREMENTAL_RUNS, METRICS_PROMETHEUS_FILE, RUN_REPORT_FILE,
+                        STORE_MAX_AGE_HOURS, STREAMING_PIPELINE)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -17,70 +27,155 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def main():
-    """Main execution function"""
-    try:
-        logger.info("=" * 60)
-        logger.info("🚀 Starting Proxy Config Collector")
-        logger.info("=" * 60)
-        
-        # STEP 1: Collect configs
-        logger.info("\n[STEP 1/6] 📡 Collecting configs from all sources...")
-        collector = ConfigCollector()
+def run_stages(tester: ConnectionTester, scheduler: TestScheduler, dead_set: DeadSet,
+               store: Optional[ConfigStore] = None):
+    """Collect, parse, filter and test one stage after another
+
+    With a store, recent configs from sources that failed to load join the
+    collected ones, and only links without a fresh stored result are parsed
+    and geolocated.
+    Returns (categorized, tested configs), or (None, None) when nothing usable was found.
+    """
+    # STEP 1: Collect configs
+    logger.info("\n[STEP 1/6] 📡 Collecting configs from all sources...")
+    collector = ConfigCollector()
+    with METRICS.timer("stage_seconds", stage="collect"):
         raw_configs = collector.collect_all()
-        logger.info(f"✅ Collected {len(raw_configs)} raw configs")
-        
-        if not raw_configs:
-            logger.warning("⚠️  No configs collected! Exiting...")
-            return
-        
-        # STEP 2: Parse configs
-        logger.info("\n[STEP 2/6] 🔍 Parsing configs...")
-        parser = ConfigParser()
-        parsed_configs = []
+    METRICS.incr("configs_total", len(raw_configs), stage="collected")
+    logger.info(f"✅ Collected {len(raw_configs)} raw configs")
+    
+    if store is not None:
+        store.mark_seen(raw_configs, collector.sources)
+        raw_configs = set(raw_configs)
+        recalled = 0
+        for link, source in store.recent_links(collector.failed_sources).items():
+            if link not in raw_configs:
+                raw_configs.add(link)
+                collector.sources.setdefault(link, source)
+                recalled += 1
+        if recalled:
+            logger.info(f"📚 Added {recalled} configs seen in the last {STORE_MAX_AGE_HOURS}h "
+                        f"from {len(collector.failed_sources)} sources that failed to load")
+    
+    if not raw_configs:
+        logger.warning("⚠️  No configs collected! Exiting...")
+        return None, None
+    
+    collected = len(raw_configs)
+    raw_configs = dead_set.filter_links(raw_configs)
+    METRICS.incr("configs_total", collected - len(raw_configs), stage="known_dead")
+    logger.info(f"⏭️  Skipped {collected - len(raw_configs)} known-dead configs")
+    
+    # STEP 2: Parse configs
+    logger.info("\n[STEP 2/6] 🔍 Parsing configs...")
+    parser = ConfigParser()
+    parsed_configs = []
+    unparsed = []
+    stored_configs = []
+    
+    with METRICS.timer("stage_seconds", stage="parse"):
+        if store is not None:
+            stored_configs, raw_configs = store.split(raw_configs)
+            logger.info(f"♻️  {store.report()}, {len(raw_configs)} links are new or stale")
         
         for config in raw_configs:
             try:
                 parsed = parser.parse_config(config)
                 if parsed:
+                    parsed['source'] = collector.sources.get(config, '')
                     parsed_configs.append(parsed)
+                else:
+                    unparsed.append(config)
             except Exception as e:
                 logger.debug(f"Error parsing config: {e}")
                 continue
-        
-        logger.info(f"✅ Successfully parsed {len(parsed_configs)} configs")
-        
-        if not parsed_configs:
-            logger.warning("⚠️  No configs parsed successfully! Exiting...")
-            return
-        
-        # STEP 3: Filter and categorize
-        logger.info("\n[STEP 3/6] 🌍 Filtering and categorizing by country...")
-        filter_obj = ConfigFilter()
+    
+    METRICS.incr("configs_total", len(parsed_configs), stage="parsed")
+    METRICS.incr("configs_total", len(stored_configs), stage="stored")
+    logger.info(f"✅ Successfully parsed {len(parsed_configs)} configs")
+    
+    if not parsed_configs and not stored_configs:
+        logger.warning("⚠️  No configs parsed successfully! Exiting...")
+        return None, None
+    
+    # STEP 3: Filter and categorize
+    logger.info("\n[STEP 3/6] 🌍 Filtering and categorizing by country...")
+    filter_obj = ConfigFilter()
+    with METRICS.timer("stage_seconds", stage="filter"):
         categorized = filter_obj.filter_and_categorize(parsed_configs)
         
+        if store is not None:
+            store.save_located(parsed_configs, unparsed)
+            for config in stored_configs:
+                categorized.setdefault(config['country'], []).append(config)
+            for configs in categorized.values():
+                configs.sort(key=link_order)
+        
         for country in categorized:
             categorized[country] = filter_obj.remove_duplicates(categorized[country])
+    
+    logger.info(f"✅ Categorized into {len(categorized)} countries")
+    
+    # STEP 4: Test configs for all countries within the run budget
+    logger.info("\n[STEP 4/6] 🧪 Testing configs...")
+    with METRICS.timer("stage_seconds", stage="test"):
+        tested_configs = scheduler.run(categorized)
+    
+    return categorized, tested_configs
+
+
+def main():
+    """Main execution function"""
+    store = None
+    try:
+        logger.info("=" * 60)
+        logger.info("🚀 Starting Proxy Config Collector")
+        logger.info("=" * 60)
         
-        logger.info(f"✅ Categorized into {len(categorized)} countries")
-        
-        # STEP 4: Test configs for specific countries
-        logger.info("\n[STEP 4/6] 🧪 Testing configs for Iran and Germany...")
-        tester = ConnectionTester()
-        tested_configs = {}
-        
-        for country in TEST_COUNTRIES:
-            if country in categorized:
-                logger.info(f"Testing {len(categorized[country])} configs for {country}...")
-                tested = tester.test_configs(categorized[country])
-                if tested:
-                    tested_configs[country] = tested
-                    logger.info(f"✅ Found {len(tested)} working configs for {country}")
+        history = TestHistory()
+        tester = ConnectionTester(history=history)
+        scheduler = TestScheduler(tester)
+        dead_set = DeadSet()
+        dead_set.maybe_rotate()
+        store = ConfigStore() if INCREMENTAL_RUNS else None
+        
+        if STREAMING_PIPELINE:
+            # STEPS 1-4 run concurrently, connected by bounded queues
+            logger.info("\n[STEPS 1-4/6] 🔀 Collecting, parsing, filtering and testing as a stream...")
+            pipeline = StreamingPipeline(ConfigCollector(), ConfigParser(), ConfigFilter(),
+                                         tester, scheduler, dead_set=dead_set, store=store)
+            with METRICS.timer("stage_seconds", stage="pipeline"):
+                categorized, tested_configs = pipeline.run()
+            
+            if not categorized:
+                logger.warning("⚠️  No configs found! Exiting...")
+                return
+        else:
+            categorized, tested_configs = run_stages(tester, scheduler, dead_set, store)
+            if categorized is None:
+                return
+        
+        for country, tested in tested_configs.items():
+            logger.info(f"✅ Found {len(tested)} working configs for {country}")
+        METRICS.incr("configs_total", sum(len(c) for c in categorized.values()), stage="categorized")
+        METRICS.incr("configs_total", sum(len(c) for c in tested_configs.values()), stage="working")
+        
+        history.save()
+        if store is not None:
+            store.prune()
+        
+        all_configs = [config for configs in categorized.values() for config in configs]
+        added = dead_set.add_dead_configs(all_configs, DEAD_FAIL_STREAK)
+        logger.info(f"Marked {added} configs as known-dead")
+        dead_set.save()
         
         # STEP 5: Generate outputs
         logger.info("\n[STEP 5/6] 📝 Generating output files...")
-        generator = OutputGenerator()
-        generator.generate_all_outputs(categorized, tested_configs)
+        scorer = QualityScorer()
+        scorer.learn_sources(categorized)
+        generator = OutputGenerator(scorer=scorer)
+        with METRICS.timer("stage_seconds", stage="generate"):
+            generator.generate_all_outputs(categorized, tested_configs)
         
         # STEP 6: Summary
         logger.info("\n[STEP 6/6] 📊 Summary")
@@ -102,7 +197,14 @@ def main():
         
     except Exception as e:
         logger.error(f"❌ Fatal error in main: {e}", exc_info=True)
+        METRICS.incr("run_errors_total", error=type(e).__name__)
         raise
+    
+    finally:
+        if store is not None:
+            store.close()
+        METRICS.write_report(RUN_REPORT_FILE, METRICS_PROMETHEUS_FILE,
+                             mode="streaming" if STREAMING_PIPELINE else "staged")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+"""
+Bloom filter module for remembering configs that have been dead for a while
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+import zlib
+from typing import Iterable, Optional, Set
+from .config import DEAD_SET_FILE, DEAD_SET_CAPACITY, DEAD_SET_ERROR_RATE, DEAD_SET_ROTATE_DAYS
+from .fingerprint import link_fingerprint
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float, bits: Optional[bytearray] = None,
+                 count: int = 0):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        size = (self.num_bits + 7) // 8
+        self.bits = bits if bits is not None and len(bits) == size else bytearray(size)
+        self.count = count
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        added = False
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class DeadSet:
+    """Persistent set of fingerprints of configs that failed consistently
+
+    Two generations of Bloom filters are kept. New entries go into the
+    current one, lookups check both, and every DEAD_SET_ROTATE_DAYS the
+    previous generation is dropped. An entry therefore expires 1-2 rotation
+    periods after it was last added, and memory stays fixed no matter how
+    many links are seen (false positives grow past capacity instead).
+    """
+
+    def __init__(self, path: str = DEAD_SET_FILE, capacity: int = DEAD_SET_CAPACITY,
+                 error_rate: float = DEAD_SET_ERROR_RATE, rotate_days: float = DEAD_SET_ROTATE_DAYS):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotate_seconds = rotate_days * 86400
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = BloomFilter(capacity, error_rate)
+        self.rotated_at = time.time()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                payload = zlib.decompress(f.read())
+            if header.get('capacity') != self.capacity or header.get('error_rate') != self.error_rate:
+                logger.info("Dead set parameters changed, starting over")
+                return
+            size = len(self.current.bits)
+            self.current = BloomFilter(self.capacity, self.error_rate,
+                                       bytearray(payload[:size]), header.get('current_count', 0))
+            self.previous = BloomFilter(self.capacity, self.error_rate,
+                                        bytearray(payload[size:]), header.get('previous_count', 0))
+            self.rotated_at = header.get('rotated_at', self.rotated_at)
+            logger.info(f"Loaded dead set ({self.current.count} + {self.previous.count} entries)")
+        except Exception as e:
+            logger.warning(f"Could not load dead set {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            header = {
+                'capacity': self.capacity,
+                'error_rate': self.error_rate,
+                'rotated_at': self.rotated_at,
+                'current_count': self.current.count,
+                'previous_count': self.previous.count,
+            }
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(header, sort_keys=True).encode('utf-8') + b'\n')
+                f.write(zlib.compress(bytes(self.current.bits) + bytes(self.previous.bits), 9))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save dead set {self.path}: {e}")
+
+    def maybe_rotate(self, now: Optional[float] = None):
+        """Drop the previous generation once the current one is old enough"""
+        now = now or time.time()
+        if now - self.rotated_at >= self.rotate_seconds:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.rotated_at = now
+            logger.info("Rotated dead set generation")
+
+    def add(self, fingerprint: str):
+        self.current.add(fingerprint)
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return fingerprint in self.current or fingerprint in self.previous
+
+    def filter_links(self, links: Iterable[str]) -> Set[str]:
+        """Drop raw links whose fingerprint is known dead"""
+        return {link for link in links if link_fingerprint(link) not in self}
+
+    def add_dead_configs(self, configs: Iterable[dict], min_fail_streak: int) -> int:
+        """Add configs whose endpoint failed at least `min_fail_streak` runs in a row"""
+        added = 0
+        for config in configs:
+            if config.get('streak', 0) <= -min_fail_streak and config.get('original'):
+                self.add(link_fingerprint(config['original']))
+                added += 1
+        return added
@@ -5,10 +5,13 @@ Collector module for gathering proxy configs from various sources
 import re
 import requests
 import logging
-from typing import Set
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
 from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from .config import *
+from .metrics import METRICS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,6 +22,14 @@ class ConfigCollector:
     
     def __init__(self):
         self.configs: Set[str] = set()
+        # source of each config for source reliability scoring (the smallest URL when
+        # several carry it, so it doesn't depend on which collector thread got there first)
+        self.sources: Dict[str, str] = {}
+        # sources that could not be fetched in this run
+        self.failed_sources: Set[str] = set()
+        # called with (configs, source) as soon as a source has been extracted
+        self.on_extracted: Optional[Callable[[Set[str], str], None]] = None
+        self._lock = threading.Lock()
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
@@ -59,25 +70,29 @@ class ConfigCollector:
         for repo in GITHUB_REPOS:
             try:
                 paths = [
-                    f"https://raw.githubusercontent.com/{repo}/main/sub/mix",
-                    f"https://raw.githubusercontent.com/{repo}/main/sub/base64",
-                    f"https://raw.githubusercontent.com/{repo}/master/sub/mix",
-                    f"https://raw.githubusercontent.com/{repo}/main/configs.txt",
-                    f"https://raw.githubusercontent.com/{repo}/master/v2ray",
+                    f"{GITHUB_RAW_BASE}/{repo}/main/sub/mix",
+                    f"{GITHUB_RAW_BASE}/{repo}/main/sub/base64",
+                    f"{GITHUB_RAW_BASE}/{repo}/master/sub/mix",
+                    f"{GITHUB_RAW_BASE}/{repo}/main/configs.txt",
+                    f"{GITHUB_RAW_BASE}/{repo}/master/v2ray",
                 ]
                 
                 for url in paths:
                     try:
-                        response = self.session.get(url, timeout=CONNECTION_TIMEOUT)
+                        response = self._fetch(url, 'github')
                         if response.status_code == 200:
                             # این منابع معمولاً متن خالص هستند
                             extracted = self._extract_configs_from_text(response.text)
+                            self._remember_source(extracted, url)
                             configs.update(extracted)
                             logger.info(f"Found {len(extracted)} configs from {url}")
                             break
                     except Exception as e:
                         logger.debug(f"Failed to fetch {url}: {e}")
                         continue
+                else:
+                    # no path of the repo could be loaded
+                    self._mark_failed(paths)
                         
             except Exception as e:
                 logger.error(f"Error collecting from GitHub repo {repo}: {e}")
@@ -92,8 +107,9 @@ class ConfigCollector:
         
         for channel in TELEGRAM_CHANNELS:
             try:
-                response = self.session.get(channel, timeout=CONNECTION_TIMEOUT)
+                response = self._fetch(channel, 'telegram')
                 if response.status_code != 200:
+                    self._mark_failed([channel])
                     continue
 
                 # ۱. HTML را parse می‌کنیم
@@ -102,10 +118,12 @@ class ConfigCollector:
                 text_content = soup.get_text(separator=' ')
                 # ۳. روی متن خالص regex می‌زنیم (نه روی HTML خام)
                 extracted = self._extract_configs_from_text(text_content)
+                self._remember_source(extracted, channel)
                 configs.update(extracted)
                 logger.info(f"Found {len(extracted)} configs from {channel}")
             except Exception as e:
                 logger.error(f"Error collecting from Telegram {channel}: {e}")
+                self._mark_failed([channel])
                 continue
         
         return configs
@@ -117,13 +135,17 @@ class ConfigCollector:
         
         for api_url in PUBLIC_APIS:
             try:
-                response = self.session.get(api_url, timeout=CONNECTION_TIMEOUT)
+                response = self._fetch(api_url, 'api')
                 if response.status_code == 200:
                     extracted = self._extract_configs_from_text(response.text)
+                    self._remember_source(extracted, api_url)
                     configs.update(extracted)
                     logger.info(f"Found {len(extracted)} configs from {api_url}")
+                else:
+                    self._mark_failed([api_url])
             except Exception as e:
                 logger.error(f"Error collecting from API {api_url}: {e}")
+                self._mark_failed([api_url])
                 continue
         
         return configs
@@ -139,19 +161,54 @@ class ConfigCollector:
         
         for url in WEB_SCRAPE_URLS:
             try:
-                response = self.session.get(url, timeout=CONNECTION_TIMEOUT)
+                response = self._fetch(url, 'web')
                 if response.status_code == 200:
                     soup = BeautifulSoup(response.text, 'html.parser')
                     text_content = soup.get_text(separator=' ')
                     extracted = self._extract_configs_from_text(text_content)
+                    self._remember_source(extracted, url)
                     configs.update(extracted)
                     logger.info(f"Found {len(extracted)} configs from {url}")
+                else:
+                    self._mark_failed([url])
             except Exception as e:
                 logger.error(f"Error scraping web {url}: {e}")
+                self._mark_failed([url])
                 continue
         
         return configs
     
+    def _fetch(self, url: str, kind: str) -> requests.Response:
+        """GET a source, recording its latency and outcome"""
+        start = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = self.session.get(url, timeout=CONNECTION_TIMEOUT)
+            outcome = 'ok' if response.status_code == 200 else f"http_{response.status_code}"
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            METRICS.record_time("fetch_seconds", elapsed, kind=kind)
+            METRICS.record_time("source_fetch_seconds", elapsed, source=url)
+            METRICS.incr("fetches_total", kind=kind, outcome=outcome)
+    
+    def _remember_source(self, configs: Set[str], source: str):
+        """Record where configs came from (the smallest source URL wins)"""
+        METRICS.incr("source_configs_total", len(configs), source=source)
+        with self._lock:
+            for config in configs:
+                known = self.sources.get(config)
+                if known is None or source < known:
+                    self.sources[config] = source
+        if self.on_extracted is not None and configs:
+            self.on_extracted(configs, source)
+    
+    def _mark_failed(self, sources: List[str]):
+        """Record sources that could not be loaded, so their earlier configs can stand in"""
+        with self._lock:
+            self.failed_sources.update(sources)
+    
+    @METRICS.timed("extract_seconds")
     def _extract_configs_from_text(self, text: str) -> Set[str]:
         """Extract proxy configs from plain text using regex patterns"""
         configs: Set[str] = set()
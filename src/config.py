@@ -1,5 +1,6 @@
 # Configuration file for proxy collector
 
+import json
 import os
 
 # ==================== SOURCES CONFIGURATION ====================
@@ -56,6 +57,20 @@ PUBLIC_APIS = [
 
 WEB_SCRAPE_URLS = []
 
+# Base URL for the GitHub repo files above (raw.githubusercontent.com layout)
+GITHUB_RAW_BASE = os.getenv("GITHUB_RAW_BASE", "https://raw.githubusercontent.com").rstrip("/")
+
+# Offline runs and load tests: a JSON file whose "telegram_channels", "github_repos",
+# "public_apis" and "web_scrape_urls" lists replace the ones above
+SOURCES_FILE = os.getenv("SOURCES_FILE", "")
+if SOURCES_FILE:
+    with open(SOURCES_FILE, "r", encoding="utf-8") as _sources_file:
+        _sources = json.load(_sources_file)
+    TELEGRAM_CHANNELS = _sources.get("telegram_channels", TELEGRAM_CHANNELS)
+    GITHUB_REPOS = _sources.get("github_repos", GITHUB_REPOS)
+    PUBLIC_APIS = _sources.get("public_apis", PUBLIC_APIS)
+    WEB_SCRAPE_URLS = _sources.get("web_scrape_urls", WEB_SCRAPE_URLS)
+
 # ==================== IRANIAN CDN CONFIGURATION ====================
 
 ARVAN_CLOUD_RANGES = [
@@ -68,6 +83,30 @@ DERAK_CLOUD_RANGES = [
     "151.243.0.0/16",
 ]
 
+CLOUDFLARE_RANGES = [
+    "173.245.48.0/20",
+    "103.21.244.0/22",
+    "103.22.200.0/22",
+    "103.31.4.0/22",
+    "141.101.64.0/18",
+    "108.162.192.0/18",
+    "190.93.240.0/20",
+    "197.234.240.0/22",
+    "198.41.128.0/17",
+    "162.158.0.0/15",
+    "104.16.0.0/13",
+    "104.24.0.0/14",
+    "172.64.0.0/13",
+    "131.0.72.0/22",
+    "2400:cb00::/32",
+    "2606:4700::/32",
+    "2803:f800::/32",
+    "2405:b500::/32",
+    "2405:8100::/32",
+    "2a06:98c0::/29",
+    "2c0f:f248::/32",
+]
+
 IRANIAN_ASNS = {
     "AS44244": "Irancell",
     "AS197207": "MCI", 
@@ -80,11 +119,54 @@ IRANIAN_ASNS = {
     "AS48434": "FaraPik",
 }
 
+# ==================== GEO CONFIGURATION ====================
+
+IRAN_IP_RANGES_URL = os.getenv(
+    "IRAN_IP_RANGES_URL",
+    "https://raw.githubusercontent.com/herrbischoff/country-ip-blocks/master/ipv4/ir.cidr"
+)
+IRAN_IPV6_RANGES_URL = os.getenv(
+    "IRAN_IPV6_RANGES_URL",
+    "https://raw.githubusercontent.com/herrbischoff/country-ip-blocks/master/ipv6/ir.cidr"
+)
+
+# Also resolve AAAA records for hosts that have no A record
+RESOLVE_IPV6 = True
+
+# Providers are tried in order; later ones only see IPs the earlier ones missed.
+# "file" needs GEO_DB_FILE, "mock" needs GEO_MOCK_URL, otherwise they are skipped.
+GEO_PROVIDERS = [name.strip() for name in os.getenv("GEO_PROVIDERS", "file,mock,ipinfo,ip-api").split(",")
+                 if name.strip()]
+
+# Max lookup requests per provider and run (None = unlimited)
+GEO_PROVIDER_QUOTAS = {
+    "ipinfo": None,
+    "ip-api": 15,
+}
+
+IPINFO_TOKEN = os.getenv("IPINFO_TOKEN", "")
+GEO_DB_FILE = os.getenv("GEO_DB_FILE", "")
+GEO_MOCK_URL = os.getenv("GEO_MOCK_URL", "")
+
 # ==================== COUNTRY FILTERS ====================
 
 TEST_COUNTRIES = ["IR", "DE"]
 PRIORITY_COUNTRY = "IR"
 
+# Test every categorized country (TEST_COUNTRIES only when False)
+TEST_ALL_COUNTRIES = True
+
+# Relative share of the probe budget per country (others get the default)
+COUNTRY_TEST_WEIGHTS = {"IR": 4, "DE": 2}
+DEFAULT_COUNTRY_TEST_WEIGHT = 1
+
+# Stop testing a country once it has this many working configs (None = test all);
+# probes are ordered by prior success so the likeliest endpoints go first
+TEST_QUOTA_PER_COUNTRY = 50
+
+# Wall-clock budget for the whole test step (None = unlimited)
+TEST_TIME_BUDGET_SECONDS = 900
+
 # ==================== OUTPUT CONFIGURATION ====================
 
 OUTPUT_DIR = "output"
@@ -93,12 +175,151 @@ GERMANY_DIR = os.path.join(OUTPUT_DIR, "germany")
 OTHERS_DIR = os.path.join(OUTPUT_DIR, "others")
 TESTED_DIR = os.path.join(OUTPUT_DIR, "tested")
 
+# State kept between runs that only changes with the outputs (committed by the
+# workflow next to output/)
+STATE_DIR = "state"
+OUTPUT_FINGERPRINTS_FILE = os.path.join(STATE_DIR, "output_fingerprints.json")
+
+# State that changes every run: restored and saved by the workflow with
+# actions/cache instead of being committed (gitignored)
+CACHE_DIR = "cache"
+HISTORY_FILE = os.path.join(CACHE_DIR, "test_history.json")
+DEAD_SET_FILE = os.path.join(CACHE_DIR, "dead_set.bin")
+REBUILD_CACHE_FILE = os.path.join(CACHE_DIR, "rebuild_cache.json")
+
+# Incremental runs: every collected config is kept in an SQLite store with its parse and
+# geo result, so a run only parses and geolocates links it hasn't handled recently.
+# When a source can't be loaded, the configs it carried in the last STORE_MAX_AGE_HOURS
+# stand in for it; configs its sources have dropped are not carried over.
+INCREMENTAL_RUNS = os.getenv("INCREMENTAL_RUNS", "1").lower() in ("1", "true", "yes")
+STORE_FILE = os.path.join(CACHE_DIR, "configs.sqlite")
+STORE_MAX_AGE_HOURS = 24
+# Re-resolve and re-geolocate stored configs this often (hosts move), and retry
+# links that could not be parsed or located after STORE_RETRY_HOURS
+STORE_GEO_TTL_HOURS = 72
+STORE_RETRY_HOURS = 24
+
+# Per-run report: stage durations, fetch/probe outcomes, cache hit rates, latency histograms.
+# It differs on every run, so it lives outside the committed output/ and state/ trees
+# (reports/ is gitignored; the workflow uploads it as an artifact)
+REPORTS_DIR = "reports"
+RUN_REPORT_FILE = os.path.join(REPORTS_DIR, "run_report.json")
+# Also export the run's metrics in Prometheus text format, e.g. for node_exporter's
+# textfile collector ("" = off)
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE", "")
+METRICS_PREFIX = "proxy_collector"
+
+# Per-config fields that change between runs without the config changing; a JSON
+# file that only differs in these (or its `updated` stamp) is not rewritten
+OUTPUT_VOLATILE_CONFIG_KEYS = ("latency_ms", "jitter_ms", "loss", "score", "uptime", "streak")
+
+# Keep only the N best-scored configs per country file (None = keep all)
+OUTPUT_TOP_N = None
+
+# Order of configs in output files: "score" (best first, in SCORE_ORDER_BUCKET
+# steps, fastest first within a step, then by fingerprint) or "fingerprint" (fully stable)
+OUTPUT_ORDER = "score"
+
+# Index in config names: "position" (1, 2, 3, ... in file order) or
+# "fingerprint" (short hash that stays with the config when others come and go)
+OUTPUT_NAME_INDEX = "position"
+
+# Country outputs are generated in parallel: "process", "thread" or "none"
+OUTPUT_EXECUTOR = "process"
+# Worker count for output generation (None = one per CPU core)
+OUTPUT_WORKERS = None
+
+# Also write a compact configs.min.json (no indent, no duplicated `rebuilt` link)
+OUTPUT_COMPACT_JSON = True
+
+# Precompressed siblings written next to every TXT/subscription file
+# (".br" needs the optional brotli package)
+OUTPUT_PRECOMPRESS = ("gz", "br")
+
+# Split countries with more configs than this into shard subscriptions of at
+# most this many configs, listed in <country>/shards.json (None = off)
+OUTPUT_SHARD_SIZE = 100
+# Shard grouping: any of "protocol" and "tier"
+OUTPUT_SHARD_BY = ("protocol",)
+# Score tiers for OUTPUT_SHARD_BY "tier": name -> minimum score, best first
+OUTPUT_SCORE_TIERS = {"a": 0.7, "b": 0.4, "c": 0.0}
+
+# Client config files written per country (see src/exporters.py): any of
+# "clash", "sing-box" and "xray"
+OUTPUT_CLIENT_FORMATS = ("clash", "sing-box", "xray")
+
+# ==================== SCORING CONFIGURATION ====================
+
+SCORE_WEIGHTS = {
+    "latency": 0.4,
+    "uptime": 0.25,
+    "source": 0.15,
+    "protocol": 0.2,
+}
+
+# Connect latency that scores 0.5 on the latency component
+SCORE_LATENCY_REF_MS = 300
+
+# Score step within which configs are ordered by latency, then by fingerprint
+SCORE_ORDER_BUCKET = 0.05
+# Latency step for that ordering, so jitter below it doesn't reorder configs
+SCORE_ORDER_LATENCY_MS = 50
+
+PROTOCOL_SCORES = {
+    "vless": 1.0, "trojan": 0.9, "hysteria2": 0.9, "vmess": 0.8,
+    "tuic": 0.8, "ss": 0.7, "hysteria": 0.6, "ssr": 0.4,
+}
+
+SECURITY_SCORES = {
+    "reality": 1.0, "tls": 0.95, "xtls": 0.95, "": 0.8, "none": 0.8,
+}
+
 # ==================== UPDATE CONFIGURATION ====================
 
 UPDATE_INTERVAL_HOURS = 4
 CONNECTION_TIMEOUT = 10
 MAX_WORKERS = 20
 
+# Streaming mode: run collection, parsing, filtering and testing concurrently
+STREAMING_PIPELINE = os.getenv("STREAMING_PIPELINE", "").lower() in ("1", "true", "yes")
+# Max items waiting between two pipeline stages (backpressure beyond that)
+PIPELINE_QUEUE_SIZE = 2000
+# Geolocation/testing batch size, and how long to wait for a batch to fill (seconds)
+PIPELINE_BATCH_SIZE = 500
+PIPELINE_BATCH_WAIT = 2.0
+
+# Connection tester: max in-flight probes overall and per target IP
+PROBE_CONCURRENCY = 1000
+PROBE_PER_IP_LIMIT = 4
+
+# Connect samples per endpoint; an endpoint works if its loss stays <= PROBE_MAX_LOSS.
+# Sampling stops at the first timeout, so an endpoint costs at most one full timeout
+PROBE_SAMPLES = 3
+PROBE_MAX_LOSS = 0.5
+
+# "auto": TLS handshake (with the config's SNI/ALPN) for tls/reality/sni configs,
+# plain TCP connect otherwise. "tcp": TCP connect for everything.
+PROBE_MODE = "auto"
+
+# hysteria/hysteria2/tuic are probed over UDP with a QUIC packet and a short deadline
+UDP_PROBE_TIMEOUT = 3
+
+# Max endpoints probed per run (None = unlimited); the rest reuse their last result
+PROBE_BUDGET_PER_RUN = 5000
+
+# Stable endpoints are retested every RETEST_BASE_HOURS * 2^(streak-2) hours,
+# capped at RETEST_MAX_FACTOR times the base; new and flapping ones every run
+RETEST_BASE_HOURS = 8
+RETEST_MAX_FACTOR = 8
+HISTORY_MAX_AGE_DAYS = 14
+
+# Configs whose endpoint failed this many runs in a row are skipped right after
+# extraction until their dead-set generation expires (1-2 rotation periods)
+DEAD_FAIL_STREAK = 4
+DEAD_SET_CAPACITY = 200000
+DEAD_SET_ERROR_RATE = 0.01
+DEAD_SET_ROTATE_DAYS = 7
+
 # ==================== GITHUB CONFIGURATION ====================
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
@@ -0,0 +1,463 @@
+"""
+Exporters module: client config formats (Clash, sing-box, Xray) built from parsed fields
+"""
+
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+import yaml
+from .config import *
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _port(config: Dict) -> Optional[int]:
+    try:
+        return int(config.get('port', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+def _alpn(config: Dict) -> List[str]:
+    alpn = config.get('alpn', '') or ''
+    if isinstance(alpn, list):
+        return [str(a).strip() for a in alpn if str(a).strip()]
+    return [a.strip() for a in str(alpn).split(',') if a.strip()]
+
+
+def _transport(config: Dict) -> Dict:
+    """Normalized transport fields shared by all exporters"""
+    network = str(config.get('network', '') or 'tcp').lower()
+    if network == 'raw':
+        network = 'tcp'
+    return {
+        'network': network,
+        'host': config.get('host', '') or '',
+        'path': config.get('path', '') or '',
+        # VMess links carry the gRPC service name in `path`
+        'service_name': config.get('serviceName', '') or (config.get('path', '') if network == 'grpc' else ''),
+        'header_type': str(config.get('headerType', '') or '').lower(),
+    }
+
+
+def _tls_kind(config: Dict) -> str:
+    """'reality', 'tls' or '' (plain)"""
+    security = str(config.get('security', '') or '').lower()
+    if security == 'reality':
+        return 'reality'
+    if security in ('tls', 'xtls'):
+        return 'tls'
+    return ''
+
+
+def _ss_plugin(config: Dict) -> tuple:
+    """SIP002 plugin of an SS config as (name, {option: value}); flags like `tls` map to True
+
+    simple-obfs goes by obfs-local, the name sing-box and most servers use.
+    """
+    name = str(config.get('plugin', '') or '').strip().lower()
+    if name in ('', 'none'):
+        return '', {}
+    if name == 'simple-obfs':
+        name = 'obfs-local'
+    options = {}
+    for option in str(config.get('plugin_opts', '') or '').split(';'):
+        key, sep, value = option.partition('=')
+        if key.strip():
+            options[key.strip()] = value.strip() if sep else True
+    return name, options
+
+
+class ClientExporter(ABC):
+    """Base class for client config exporters
+
+    Subclasses turn one parsed config into a client outbound (`outbound`,
+    None when the client can't express it) and render a list of them into
+    the final file (`render`).
+    """
+
+    name = "base"
+    filename = ""
+
+    @abstractmethod
+    def outbound(self, config: Dict, name: str) -> Optional[Dict]:
+        """One config as a client outbound, or None when the client can't express it"""
+
+    @abstractmethod
+    def render(self, outbounds: List[Dict]) -> str:
+        """The client file holding `outbounds`"""
+
+    def export(self, configs: List[Dict], names: List[str]) -> Optional[str]:
+        """Render configs under the given display names, skipping unsupported ones"""
+        outbounds = []
+        used = set()
+        for config, name in zip(configs, names):
+            # clients key proxies by name, so names must be unique
+            unique, n = name, 2
+            while unique in used:
+                unique, n = f"{name} ({n})", n + 1
+            name = unique
+            try:
+                outbound = self.outbound(config, name)
+            except Exception as e:
+                logger.debug(f"{self.name}: could not export {config.get('type')} config: {e}")
+                continue
+            if outbound:
+                used.add(name)
+                outbounds.append(outbound)
+        if not outbounds:
+            return None
+        return self.render(outbounds)
+
+
+class ClashExporter(ClientExporter):
+    """Clash Meta (mihomo) YAML with a select group over all proxies"""
+
+    name = "clash"
+    filename = "clash.yaml"
+    networks = ('tcp', 'ws', 'grpc', 'h2', 'http')
+
+    def outbound(self, config: Dict, name: str) -> Optional[Dict]:
+        port = _port(config)
+        protocol = str(config.get('type', '')).lower()
+        if not config.get('address') or port is None:
+            return None
+
+        proxy = {'name': name, 'server': config['address'], 'port': port}
+
+        if protocol == 'ss':
+            proxy.update({'type': 'ss', 'cipher': config.get('method', ''),
+                          'password': config.get('password', ''), 'udp': True})
+            plugin, options = _ss_plugin(config)
+            if plugin == 'obfs-local':
+                proxy['plugin'] = 'obfs'
+                proxy['plugin-opts'] = {'mode': options.get('obfs', 'http'), 'host': options.get('obfs-host', '')}
+            elif plugin == 'v2ray-plugin':
+                proxy['plugin'] = 'v2ray-plugin'
+                proxy['plugin-opts'] = {'mode': options.get('mode', 'websocket'), 'tls': options.get('tls') is True,
+                                        'host': options.get('host', ''), 'path': options.get('path', '/')}
+            elif plugin:
+                return None
+            return proxy
+
+        if protocol == 'hysteria2':
+            proxy.update({'type': 'hysteria2', 'password': config.get('password', '')})
+            if config.get('sni'):
+                proxy['sni'] = config['sni']
+            if config.get('insecure'):
+                proxy['skip-cert-verify'] = True
+            if config.get('obfs'):
+                proxy['obfs'] = config['obfs']
+                proxy['obfs-password'] = config.get('obfsPassword', '')
+            return proxy
+
+        if protocol == 'tuic':
+            proxy.update({'type': 'tuic', 'uuid': config.get('id', ''),
+                          'password': config.get('password', '')})
+            if config.get('sni'):
+                proxy['sni'] = config['sni']
+            if _alpn(config):
+                proxy['alpn'] = _alpn(config)
+            if config.get('congestion_control'):
+                proxy['congestion-controller'] = config['congestion_control']
+            if config.get('insecure'):
+                proxy['skip-cert-verify'] = True
+            return proxy
+
+        if protocol not in ('vmess', 'vless', 'trojan'):
+            return None
+
+        transport = _transport(config)
+        if transport['network'] not in self.networks:
+            return None
+        tls = _tls_kind(config)
+
+        if protocol == 'vmess':
+            proxy.update({'type': 'vmess', 'uuid': config.get('id', ''),
+                          'alterId': int(config.get('alterId', 0) or 0),
+                          'cipher': config.get('cipher', 'auto') or 'auto', 'tls': bool(tls)})
+        elif protocol == 'vless':
+            proxy.update({'type': 'vless', 'uuid': config.get('id', ''), 'tls': bool(tls)})
+            if config.get('flow'):
+                proxy['flow'] = config['flow']
+        else:
+            proxy.update({'type': 'trojan', 'password': config.get('password', '')})
+
+        proxy['udp'] = True
+        if tls:
+            server_name = config.get('sni') or transport['host']
+            if server_name:
+                proxy['sni' if protocol == 'trojan' else 'servername'] = server_name
+            if _alpn(config):
+                proxy['alpn'] = _alpn(config)
+            if config.get('fingerprint'):
+                proxy['client-fingerprint'] = config['fingerprint']
+        if tls == 'reality':
+            proxy['reality-opts'] = {'public-key': config.get('publicKey', ''),
+                                     'short-id': config.get('shortId', '')}
+
+        network = transport['network']
+        if network == 'ws':
+            opts = {'path': transport['path'] or '/'}
+            if transport['host']:
+                opts['headers'] = {'Host': transport['host']}
+            proxy['network'] = 'ws'
+            proxy['ws-opts'] = opts
+        elif network == 'grpc':
+            proxy['network'] = 'grpc'
+            proxy['grpc-opts'] = {'grpc-service-name': transport['service_name']}
+        elif network == 'h2':
+            proxy['network'] = 'h2'
+            proxy['h2-opts'] = {'host': [transport['host']] if transport['host'] else [],
+                                'path': transport['path'] or '/'}
+        elif network == 'http' or transport['header_type'] == 'http':
+            proxy['network'] = 'http'
+            proxy['http-opts'] = {'path': [transport['path'] or '/'],
+                                  'headers': {'Host': [transport['host']]} if transport['host'] else {}}
+        return proxy
+
+    def render(self, outbounds: List[Dict]) -> str:
+        names = [proxy['name'] for proxy in outbounds]
+        document = {
+            'proxies': outbounds,
+            'proxy-groups': [
+                {'name': 'auto', 'type': 'url-test', 'proxies': names,
+                 'url': 'https://www.gstatic.com/generate_204', 'interval': 300},
+                {'name': 'select', 'type': 'select', 'proxies': ['auto'] + names},
+            ],
+            'rules': ['MATCH,select'],
+        }
+        return yaml.safe_dump(document, allow_unicode=True, sort_keys=False)
+
+
+class SingBoxExporter(ClientExporter):
+    """sing-box outbounds with a selector and urltest over all of them"""
+
+    name = "sing-box"
+    filename = "sing-box.json"
+    networks = ('tcp', 'ws', 'grpc', 'h2', 'http', 'httpupgrade', 'quic')
+
+    def _tls(self, config: Dict, always: bool = False) -> Optional[Dict]:
+        kind = _tls_kind(config)
+        if not kind and not always:
+            return None
+        tls = {'enabled': True}
+        server_name = config.get('sni') or config.get('host')
+        if server_name:
+            tls['server_name'] = server_name
+        if config.get('insecure'):
+            tls['insecure'] = True
+        if _alpn(config):
+            tls['alpn'] = _alpn(config)
+        # sing-box refuses a REALITY outbound without uTLS, so default it like Xray does
+        fingerprint = config.get('fingerprint') or ('chrome' if kind == 'reality' else '')
+        if fingerprint:
+            tls['utls'] = {'enabled': True, 'fingerprint': fingerprint}
+        if kind == 'reality':
+            tls['reality'] = {'enabled': True, 'public_key': config.get('publicKey', ''),
+                              'short_id': config.get('shortId', '')}
+        return tls
+
+    def _transport(self, config: Dict) -> Optional[Dict]:
+        transport = _transport(config)
+        network = transport['network']
+        if network == 'ws':
+            result = {'type': 'ws', 'path': transport['path'] or '/'}
+            if transport['host']:
+                result['headers'] = {'Host': transport['host']}
+            return result
+        if network == 'grpc':
+            return {'type': 'grpc', 'service_name': transport['service_name']}
+        if network in ('h2', 'http'):
+            result = {'type': 'http', 'path': transport['path'] or '/'}
+            if transport['host']:
+                result['host'] = [transport['host']]
+            return result
+        if network == 'httpupgrade':
+            result = {'type': 'httpupgrade', 'path': transport['path'] or '/'}
+            if transport['host']:
+                result['host'] = transport['host']
+            return result
+        if network == 'quic':
+            return {'type': 'quic'}
+        return None
+
+    def outbound(self, config: Dict, name: str) -> Optional[Dict]:
+        port = _port(config)
+        protocol = str(config.get('type', '')).lower()
+        if not config.get('address') or port is None:
+            return None
+
+        outbound = {'tag': name, 'server': config['address'], 'server_port': port}
+
+        if protocol == 'ss':
+            outbound.update({'type': 'shadowsocks', 'method': config.get('method', ''),
+                             'password': config.get('password', '')})
+            plugin, _ = _ss_plugin(config)
+            if plugin in ('obfs-local', 'v2ray-plugin'):
+                outbound['plugin'] = plugin
+                outbound['plugin_opts'] = config.get('plugin_opts', '') or ''
+            elif plugin:
+                return None
+            return outbound
+
+        if protocol == 'hysteria2':
+            outbound.update({'type': 'hysteria2', 'password': config.get('password', ''),
+                             'tls': self._tls(config, always=True)})
+            if config.get('obfs'):
+                outbound['obfs'] = {'type': config['obfs'], 'password': config.get('obfsPassword', '')}
+            return outbound
+
+        if protocol == 'tuic':
+            outbound.update({'type': 'tuic', 'uuid': config.get('id', ''),
+                             'password': config.get('password', ''),
+                             'tls': self._tls(config, always=True)})
+            if config.get('congestion_control'):
+                outbound['congestion_control'] = config['congestion_control']
+            return outbound
+
+        if protocol not in ('vmess', 'vless', 'trojan'):
+            return None
+        transport = _transport(config)
+        # sing-box has no TCP HTTP-header obfuscation
+        if transport['network'] not in self.networks or (
+                transport['network'] == 'tcp' and transport['header_type'] == 'http'):
+            return None
+
+        if protocol == 'vmess':
+            outbound.update({'type': 'vmess', 'uuid': config.get('id', ''),
+                             'security': config.get('cipher', 'auto') or 'auto',
+                             'alter_id': int(config.get('alterId', 0) or 0)})
+        elif protocol == 'vless':
+            outbound.update({'type': 'vless', 'uuid': config.get('id', '')})
+            if config.get('flow'):
+                outbound['flow'] = config['flow']
+        else:
+            outbound.update({'type': 'trojan', 'password': config.get('password', '')})
+
+        tls = self._tls(config)
+        if tls:
+            outbound['tls'] = tls
+        transport = self._transport(config)
+        if transport:
+            outbound['transport'] = transport
+        return outbound
+
+    def render(self, outbounds: List[Dict]) -> str:
+        tags = [outbound['tag'] for outbound in outbounds]
+        document = {
+            'outbounds': [
+                {'type': 'selector', 'tag': 'select', 'outbounds': ['auto'] + tags, 'default': 'auto'},
+                {'type': 'urltest', 'tag': 'auto', 'outbounds': tags},
+            ] + outbounds + [{'type': 'direct', 'tag': 'direct'}],
+        }
+        return json.dumps(document, ensure_ascii=False, indent=2)
+
+
+class XrayExporter(ClientExporter):
+    """Xray outbounds list (one tagged outbound per config)"""
+
+    name = "xray"
+    filename = "xray.json"
+    networks = ('tcp', 'ws', 'grpc', 'httpupgrade', 'xhttp', 'splithttp', 'kcp')
+
+    def _stream_settings(self, config: Dict) -> Dict:
+        transport = _transport(config)
+        network = 'xhttp' if transport['network'] == 'splithttp' else transport['network']
+        stream = {'network': network}
+
+        kind = _tls_kind(config)
+        server_name = config.get('sni') or transport['host']
+        if kind == 'reality':
+            stream['security'] = 'reality'
+            stream['realitySettings'] = {
+                'serverName': server_name,
+                'fingerprint': config.get('fingerprint') or 'chrome',
+                'publicKey': config.get('publicKey', ''),
+                'shortId': config.get('shortId', ''),
+            }
+        elif kind == 'tls':
+            settings = {'serverName': server_name}
+            if _alpn(config):
+                settings['alpn'] = _alpn(config)
+            if config.get('fingerprint'):
+                settings['fingerprint'] = config['fingerprint']
+            stream['security'] = 'tls'
+            stream['tlsSettings'] = settings
+
+        if network == 'ws':
+            stream['wsSettings'] = {'path': transport['path'] or '/', 'host': transport['host']}
+        elif network == 'grpc':
+            stream['grpcSettings'] = {'serviceName': transport['service_name']}
+        elif network in ('httpupgrade', 'xhttp'):
+            stream[f'{network}Settings'] = {'path': transport['path'] or '/', 'host': transport['host']}
+        elif network == 'tcp' and transport['header_type'] == 'http':
+            stream['tcpSettings'] = {'header': {'type': 'http', 'request': {
+                'path': [transport['path'] or '/'],
+                'headers': {'Host': [transport['host']]} if transport['host'] else {}}}}
+        return stream
+
+    def outbound(self, config: Dict, name: str) -> Optional[Dict]:
+        port = _port(config)
+        protocol = str(config.get('type', '')).lower()
+        address = config.get('address')
+        if not address or port is None:
+            return None
+
+        if protocol == 'ss':
+            if _ss_plugin(config)[0]:
+                # Xray has no SIP003 plugins; a plugin server can't be reached as plain SS
+                return None
+            return {'tag': name, 'protocol': 'shadowsocks', 'settings': {'servers': [
+                {'address': address, 'port': port, 'method': config.get('method', ''),
+                 'password': config.get('password', '')}]}}
+
+        if protocol not in ('vmess', 'vless', 'trojan'):
+            return None
+        if _transport(config)['network'] not in self.networks:
+            return None
+
+        if protocol == 'vmess':
+            user = {'id': config.get('id', ''), 'alterId': int(config.get('alterId', 0) or 0),
+                    'security': config.get('cipher', 'auto') or 'auto'}
+            settings = {'vnext': [{'address': address, 'port': port, 'users': [user]}]}
+        elif protocol == 'vless':
+            user = {'id': config.get('id', ''), 'encryption': config.get('encryption') or 'none'}
+            if config.get('flow'):
+                user['flow'] = config['flow']
+            settings = {'vnext': [{'address': address, 'port': port, 'users': [user]}]}
+        else:
+            settings = {'servers': [{'address': address, 'port': port,
+                                     'password': config.get('password', '')}]}
+
+        return {'tag': name, 'protocol': protocol, 'settings': settings,
+                'streamSettings': self._stream_settings(config)}
+
+    def render(self, outbounds: List[Dict]) -> str:
+        return json.dumps({'outbounds': outbounds}, ensure_ascii=False, indent=2)
+
+
+EXPORTERS = {
+    exporter.name: exporter
+    for exporter in (ClashExporter, SingBoxExporter, XrayExporter)
+}
+
+
+def register_exporter(exporter_class: type) -> type:
+    """Make an exporter available to OUTPUT_CLIENT_FORMATS (usable as a decorator)"""
+    EXPORTERS[exporter_class.name] = exporter_class
+    return exporter_class
+
+
+def build_exporters(names: Optional[List[str]] = None) -> List[ClientExporter]:
+    """Instantiate the exporters listed in OUTPUT_CLIENT_FORMATS"""
+    exporters = []
+    for name in names if names is not None else OUTPUT_CLIENT_FORMATS:
+        exporter_class = EXPORTERS.get(name)
+        if exporter_class is None:
+            logger.warning(f"Unknown client format: {name}")
+            continue
+        exporters.append(exporter_class())
+    return exporters
@@ -7,9 +7,13 @@ import ipaddress
 import requests
 import logging
 import re
-from typing import Dict, Optional, Set, List
+from typing import Dict, Optional, List
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from .config import *
+from .fingerprint import link_order
+from .geo import GeoChain, build_geo_chain
+from .iprange import IPRangeIndex
+from .metrics import METRICS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,97 +22,97 @@ logger = logging.getLogger(__name__)
 class ConfigFilter:
     """Filter configs based on geo-location and CDN"""
     
-    def __init__(self):
-        self.iran_ips = self._load_iran_ip_ranges()
+    def __init__(self, geo: Optional[GeoChain] = None):
         self.session = requests.Session()
+        self.iran_ips = self._load_iran_ip_ranges()
+        self.cdn_ranges = self._build_cdn_index()
+        self.geo = geo if geo is not None else build_geo_chain()
         self.ip_cache = {}
     
-    def _load_iran_ip_ranges(self) -> Set[ipaddress.IPv4Network]:
-        """Load Iran IP ranges"""
-        ip_ranges = set()
+    def _load_iran_ip_ranges(self) -> IPRangeIndex:
+        """Load Iran IPv4 and IPv6 ranges into a range index"""
+        index = IPRangeIndex()
         
-        try:
-            url = "https://raw.githubusercontent.com/herrbischoff/country-ip-blocks/master/ipv4/ir.cidr"
-            response = self.session.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                for line in response.text.strip().split('\n'):
-                    try:
-                        ip_ranges.add(ipaddress.IPv4Network(line.strip()))
-                    except:
-                        continue
-                logger.info(f"Loaded {len(ip_ranges)} Iran IP ranges")
+        for url in [IRAN_IP_RANGES_URL, IRAN_IPV6_RANGES_URL]:
+            if not url:
+                continue
+            try:
+                response = self.session.get(url, timeout=10)
+                
+                if response.status_code == 200:
+                    loaded = 0
+                    for line in response.text.strip().split('\n'):
+                        if index.add(line.strip(), "IR"):
+                            loaded += 1
+                    logger.info(f"Loaded {loaded} Iran IP ranges from {url}")
                         
-        except Exception as e:
-            logger.warning(f"Could not load Iran IP ranges: {e}")
+            except Exception as e:
+                logger.warning(f"Could not load Iran IP ranges from {url}: {e}")
         
         for cidr in ARVAN_CLOUD_RANGES + DERAK_CLOUD_RANGES:
-            try:
-                ip_ranges.add(ipaddress.IPv4Network(cidr))
-            except:
-                continue
+            index.add(cidr, "IR")
+        
+        return index
+    
+    def _build_cdn_index(self) -> IPRangeIndex:
+        """Build the CDN range index (earlier lists win on overlap)"""
+        index = IPRangeIndex()
+        
+        for cdn, ranges in [("arvancloud", ARVAN_CLOUD_RANGES),
+                            ("derakcloud", DERAK_CLOUD_RANGES),
+                            ("cloudflare", CLOUDFLARE_RANGES)]:
+            for cidr in ranges:
+                index.add(cidr, cdn)
         
-        return ip_ranges
+        return index
     
     def get_ip_from_address(self, address: str) -> Optional[str]:
-        """Resolve domain to IP or return IP if already IP"""
+        """Resolve domain to IP (A first, then AAAA) or return IP if already IP"""
         try:
+            address = address.strip().strip('[]')
             if address in self.ip_cache:
+                METRICS.incr("resolves_total", outcome='cached')
                 return self.ip_cache[address]
             
             try:
-                ipaddress.ip_address(address)
-                self.ip_cache[address] = address
-                return address
+                ip = str(ipaddress.ip_address(address))
+                self.ip_cache[address] = ip
+                METRICS.incr("resolves_total", outcome='literal')
+                return ip
             except ValueError:
                 pass
             
-            ip = socket.gethostbyname(address)
+            ip = self._resolve_host(address)
             self.ip_cache[address] = ip
+            METRICS.incr("resolves_total", outcome='resolved' if ip else 'failed')
             return ip
             
         except Exception as e:
             logger.debug(f"Could not resolve {address}: {e}")
             return None
     
-    def get_country_code(self, ip: str) -> Optional[str]:
-        """Get country code from IP"""
-        try:
-            ip_obj = ipaddress.ip_address(ip)
-            for network in self.iran_ips:
-                if ip_obj in network:
-                    return "IR"
-            
-            response = self.session.get(f"https://ipinfo.io/{ip}/json", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('country', None)
-            
-            return None
-            
-        except Exception as e:
-            logger.debug(f"Error getting country for {ip}: {e}")
-            return None
+    @METRICS.timed("resolve_seconds")
+    def _resolve_host(self, host: str) -> Optional[str]:
+        """Resolve a hostname, preferring IPv4 and falling back to IPv6"""
+        families = [socket.AF_INET, socket.AF_INET6] if RESOLVE_IPV6 else [socket.AF_INET]
+        
+        for family in families:
+            try:
+                infos = socket.getaddrinfo(host, None, family, socket.SOCK_STREAM)
+                if infos:
+                    return infos[0][4][0]
+            except socket.gaierror:
+                continue
+        
+        return None
+    
+    def _in_iran_ranges(self, ip: str) -> bool:
+        return self.iran_ips.lookup(ipaddress.ip_address(ip)) is not None
     
     def detect_cdn(self, ip: str, address: str) -> Optional[str]:
         """Detect CDN provider"""
         try:
-            ip_obj = ipaddress.ip_address(ip)
-            
-            for cidr in ARVAN_CLOUD_RANGES:
-                if ip_obj in ipaddress.IPv4Network(cidr):
-                    return "arvancloud"
-            
-            for cidr in DERAK_CLOUD_RANGES:
-                if ip_obj in ipaddress.IPv4Network(cidr):
-                    return "derakcloud"
-            
-            cloudflare_ranges = ["173.245.48.0/20", "103.21.244.0/22"]
-            for cidr in cloudflare_ranges:
-                if ip_obj in ipaddress.IPv4Network(cidr):
-                    return "cloudflare"
-            
-            return None
+            return self.cdn_ranges.lookup(ip)
             
         except Exception as e:
             logger.debug(f"Error detecting CDN: {e}")
@@ -120,9 +124,11 @@ class ConfigFilter:
         
         logger.info(f"Filtering and categorizing {len(parsed_configs)} configs...")
         
+        # 1. Resolve addresses in parallel (DNS is the blocking part)
+        resolved = []
         with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
             futures = {
-                executor.submit(self._process_config, config): config 
+                executor.submit(self._resolve_config, config): config 
                 for config in parsed_configs
             }
             
@@ -130,52 +136,82 @@ class ConfigFilter:
                 try:
                     result = future.result()
                     if result:
-                        country, config_data = result
-                        if country not in categorized:
-                            categorized[country] = []
-                        categorized[country].append(config_data)
+                        resolved.append(result)
                 except Exception as e:
                     logger.debug(f"Error processing config: {e}")
                     continue
         
+        # 2. Geolocate all unique IPs in batches, 3. categorize
+        for country, config in self.locate(resolved):
+            if country not in categorized:
+                categorized[country] = []
+            categorized[country].append(config)
+        
+        # Thread completion order is random; sort so every run lists configs the same way
         for country, configs in categorized.items():
+            configs.sort(key=link_order)
             logger.info(f"Found {len(configs)} configs for {country}")
         
         return categorized
     
-    def _process_config(self, config: Dict) -> Optional[tuple]:
-        """Process single config"""
-        try:
-            address = config.get('address', '')
-            if not address:
-                return None
-            
-            ip = self.get_ip_from_address(address)
-            if not ip:
-                return None
-            
-            country = self.get_country_code(ip)
+    def locate(self, resolved: List[tuple]) -> List[tuple]:
+        """Geolocate resolved (ip, config) pairs and return (country, config) for the located ones
+
+        Iran ranges are checked locally; all other unique IPs go to the geo
+        chain in one batch. Sets `ip`, `country` and `cdn` on each config.
+        """
+        countries = {}
+        remote_ips = []
+        for ip, _ in resolved:
+            if ip in countries:
+                continue
+            try:
+                if self._in_iran_ranges(ip):
+                    countries[ip] = "IR"
+                    continue
+            except ValueError:
+                continue
+            countries[ip] = None
+            remote_ips.append(ip)
+        
+        if remote_ips:
+            logger.info(f"Geolocating {len(remote_ips)} unique IPs...")
+            with METRICS.timer("geolocate_seconds"):
+                countries.update(self.geo.lookup(remote_ips))
+        
+        located = []
+        for ip, config in resolved:
+            country = countries.get(ip)
             if not country:
-                return None
-            
-            cdn = self.detect_cdn(ip, address)
+                continue
             
             config['ip'] = ip
             config['country'] = country
-            config['cdn'] = cdn
-            
-            return (country, config)
-            
-        except Exception as e:
-            logger.debug(f"Error in _process_config: {e}")
+            config['cdn'] = self.detect_cdn(ip, config.get('address', ''))
+            located.append((country, config))
+        
+        METRICS.incr("located_total", len(located), outcome='located')
+        METRICS.incr("located_total", len(resolved) - len(located), outcome='unknown')
+        return located
+    
+    def _resolve_config(self, config: Dict) -> Optional[tuple]:
+        """Resolve the address of a single config to (ip, config)"""
+        address = config.get('address', '')
+        if not address:
+            return None
+        
+        ip = self.get_ip_from_address(address)
+        if not ip:
             return None
+        
+        return (ip, config)
     
     def remove_duplicates(self, configs: list) -> list:
         """Remove duplicate configs based on content"""
         unique = {}
         
         for config in configs:
-            content_hash = f"{config['type']}_{config['address']}_{config['port']}_{config.get('id', '')}_{config.get('password', '')}"
+            content_hash = self.duplicate_key(config)
             
             if content_hash not in unique:
                 unique[content_hash] = config
@@ -185,3 +221,8 @@ class ConfigFilter:
             logger.info(f"Removed {removed} duplicate configs")
         
         return list(unique.values())
+    
+    @staticmethod
+    def duplicate_key(config: Dict) -> str:
+        """Configs with the same key are the same server and credentials"""
+        return f"{config['type']}_{config['address']}_{config['port']}_{config.get('id', '')}_{config.get('password', '')}"
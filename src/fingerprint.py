@@ -0,0 +1,30 @@
+"""
+Fingerprint helpers for identifying configs independently of their name
+"""
+
+import hashlib
+import html
+from typing import Dict, Tuple
+
+
+def link_fingerprint(link: str) -> str:
+    """Fingerprint a raw config link, ignoring its #name and surrounding noise
+
+    Cheap enough to run straight after extraction, before any parsing.
+    """
+    link = html.unescape(link.strip())
+    if not link.lower().startswith('vmess://'):
+        link = link.split('#', 1)[0]
+    scheme, sep, rest = link.partition('://')
+    normalized = scheme.lower() + sep + rest
+    return hashlib.sha1(normalized.encode('utf-8', errors='ignore')).hexdigest()[:20]
+
+
+def link_order(config: Dict) -> Tuple[str, str]:
+    """Sort key listing configs by fingerprint, then by link
+
+    Reposts share a link_id and differ only in their #name; ordering them
+    by link too means deduplication always keeps the same one, whatever
+    order they arrived in.
+    """
+    return (config.get('link_id') or '', config.get('original', ''))
@@ -3,25 +3,63 @@ Generator module for creating output files with standard protocol-based naming
 All transmission types supported: tcp, ws, grpc, h2, kcp, quic, httpupgrade, xhttp
 """
 
+import io
 import os
 import json
 import base64
 import logging
 import re
 import html
-from typing import Dict, List
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
 from datetime import datetime
 from urllib.parse import quote, parse_qs
 from .config import *
+from .exporters import build_exporters
+from .fingerprint import link_fingerprint, link_order
+from .manifest import MANIFEST_NAME, OutputFingerprints, build_manifest, load_manifest
+from .metrics import METRICS
+from .rebuild_cache import RebuildCache
+from .scoring import QualityScorer
+from .writer import OutputWriter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Percent-encoded flag emoji, precomputed once instead of per config name
+_QUOTED_FLAGS = {flag: quote(flag, safe='') for flag in set(COUNTRY_FLAGS.values()) | {'🌐'}}
+_NON_ASCII = re.compile(r'[^\x00-\x7f]+')
+
+
+def _quote_name(name: str) -> str:
+    """Percent-encode a config name for the #fragment
+
+    Same result as quote(name, safe='') (quote() ignores non-ASCII `safe`
+    characters, so flags were always encoded), but a name's single flag is
+    taken from the precomputed table and only the ASCII parts go through quote().
+    """
+    match = _NON_ASCII.search(name)
+    if match is None:
+        return quote(name, safe='')
+    quoted_flag = _QUOTED_FLAGS.get(match.group())
+    if quoted_flag is None or _NON_ASCII.search(name, match.end()):
+        return quote(name, safe='')
+    return quote(name[:match.start()], safe='') + quoted_flag + quote(name[match.end():], safe='')
+
 
 class OutputGenerator:
     """Generate output files in different formats"""
     
-    def __init__(self):
+    def __init__(self, scorer: Optional[QualityScorer] = None,
+                 rebuild_cache: Optional[Dict[str, Dict[str, list]]] = None):
+        self.scorer = scorer or QualityScorer()
+        self.writer = OutputWriter()
+        # link_id -> {"country|index|cdn": [rebuilt link, name]}; entries used this run go to rebuild_cache_used
+        self.rebuild_cache = rebuild_cache or {}
+        self.rebuild_cache_used: Dict[str, Dict[str, list]] = {}
+        self.rebuild_cache_hits = 0
+        self.exporters = build_exporters()
         self._ensure_directories()
     
     def _ensure_directories(self):
@@ -35,56 +73,129 @@ class OutputGenerator:
         logger.info("Generating output files...")
         
         try:
-            for country, configs in categorized_configs.items():
-                logger.info(f"Generating outputs for {country} with {len(configs)} configs")
-                self._generate_country_outputs(country, configs, tested=False)
-            
-            for country, configs in tested_configs.items():
-                logger.info(f"Generating tested outputs for {country} with {len(configs)} configs")
-                self._generate_country_outputs(country, configs, tested=True)
-            
+            jobs = [(country, configs, False) for country, configs in categorized_configs.items()]
+            jobs += [(country, configs, True) for country, configs in tested_configs.items()]
+            # Biggest countries first so no worker is left with a large one at the end
+            jobs.sort(key=lambda job: -len(job[1]))
+            
+            cache = RebuildCache()
+            stats = self._run_country_jobs(jobs, cache)
+            for item in stats:
+                self.writer.written += item['written']
+                self.writer.skipped += item['skipped']
+                METRICS.record_time("render_seconds", item['seconds'], output='tested' if item['tested'] else 'all')
+            
+            hits = sum(item['cache_hits'] for item in stats)
+            rebuilt = sum(item['count'] for item in stats)
+            logger.info(f"Rebuild cache: {hits}/{rebuilt} links reused")
+            METRICS.incr("rebuild_cache_total", hits, outcome='hit')
+            METRICS.incr("rebuild_cache_total", rebuilt - hits, outcome='miss')
+            cache.replace(item['rebuild_cache'] for item in stats)
+            cache.save()
+            
+            self._generate_deltas(stats)
             self._generate_readme(categorized_configs, tested_configs)
+            self._generate_manifest()
             
-            logger.info("Output generation complete!")
+            METRICS.incr("output_files_total", self.writer.written, outcome='written')
+            METRICS.incr("output_files_total", self.writer.skipped, outcome='unchanged')
+            logger.info(f"Output generation complete! ({self.writer.report()})")
             
         except Exception as e:
             logger.error(f"Error generating outputs: {e}", exc_info=True)
     
-    def _generate_country_outputs(self, country: str, configs: List[Dict], tested: bool = False):
-        """Generate outputs for a specific country"""
+    def _run_country_jobs(self, jobs: List[tuple], cache: RebuildCache) -> List[Dict]:
+        """Generate every (country, configs, tested) job, on a worker pool when it pays off"""
+        jobs = [job + (cache.subset(c.get('link_id') for c in job[1]),) for job in jobs]
+        
+        workers = min(OUTPUT_WORKERS or os.cpu_count() or 1, len(jobs))
+        if workers <= 1 or OUTPUT_EXECUTOR == "none":
+            return [_generate_country_job(self.scorer, *job) for job in jobs]
+        
+        if OUTPUT_EXECUTOR == "thread":
+            executor = ThreadPoolExecutor(max_workers=workers)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        
+        logger.info(f"Generating {len(jobs)} country outputs on {workers} {OUTPUT_EXECUTOR} workers")
         try:
-            if tested:
-                base_dir = TESTED_DIR
-                prefix = "tested_"
-            elif country == "IR":
-                base_dir = IRAN_DIR
-                prefix = ""
-            elif country == "DE":
-                base_dir = GERMANY_DIR
-                prefix = ""
-            else:
-                base_dir = OTHERS_DIR
-                prefix = ""
-            
-            country_dir = os.path.join(base_dir, country.lower())
+            with executor:
+                futures = [executor.submit(_generate_country_job, self.scorer, *job) for job in jobs]
+                return [future.result() for future in futures]
+        except BrokenExecutor as e:
+            logger.warning(f"Output worker pool failed ({e}), generating sequentially")
+            return [_generate_country_job(self.scorer, *job) for job in jobs]
+    
+    @staticmethod
+    def _output_location(country: str, tested: bool = False) -> tuple:
+        """(country directory, file prefix) for a country's all/tested outputs"""
+        if tested:
+            return os.path.join(TESTED_DIR, country.lower()), "tested_"
+        if country == "IR":
+            base_dir = IRAN_DIR
+        elif country == "DE":
+            base_dir = GERMANY_DIR
+        else:
+            base_dir = OTHERS_DIR
+        return os.path.join(base_dir, country.lower()), ""
+    
+    def _generate_country_outputs(self, country: str, configs: List[Dict], tested: bool = False) -> List[Dict]:
+        """Generate outputs for a specific country, returning the configs written"""
+        try:
+            country_dir, prefix = self._output_location(country, tested)
             os.makedirs(country_dir, exist_ok=True)
             
+            configs = self._order_configs(configs)
+            
             rebuilt_configs = self._rebuild_configs_with_standard_names(configs, country)
             
             logger.info(f"Rebuilt {len(rebuilt_configs)} configs for {country}")
             
             if not rebuilt_configs:
                 logger.warning(f"No configs to generate for {country}!")
-                return
+                return []
             
             self._generate_json(country_dir, prefix + "configs.json", rebuilt_configs)
+            if OUTPUT_COMPACT_JSON:
+                self._generate_json(country_dir, prefix + "configs.min.json", rebuilt_configs, compact=True)
             self._generate_txt(country_dir, prefix + "configs.txt", rebuilt_configs)
             self._generate_subscription(country_dir, prefix + "subscription.txt", rebuilt_configs)
+            self._generate_shards(country_dir, prefix, rebuilt_configs)
+            self._generate_client_formats(country_dir, prefix, rebuilt_configs)
             
             logger.info(f"✅ Generated outputs for {country} ({'tested' if tested else 'all'})")
+            return rebuilt_configs
             
         except Exception as e:
             logger.error(f"Error generating country outputs for {country}: {e}", exc_info=True)
+            return []
+    
+    def _order_configs(self, configs: List[Dict]) -> List[Dict]:
+        """Rank (and cap) configs by score, then apply OUTPUT_ORDER"""
+        ranked = self.scorer.rank(configs, OUTPUT_TOP_N)
+        if OUTPUT_ORDER == "fingerprint":
+            ranked.sort(key=link_order)
+        return ranked
+    
+    def _name_indexes(self, configs: List[Dict]) -> List[str]:
+        """Index part of each config's name, per OUTPUT_NAME_INDEX"""
+        if OUTPUT_NAME_INDEX != "fingerprint":
+            return [str(position) for position in range(1, len(configs) + 1)]
+        
+        labels = []
+        used = set()
+        for config in configs:
+            link_id = config.get('link_id') or ''
+            size = 4
+            label = link_id[:size]
+            while (not label or label in used) and size < len(link_id):
+                size += 2
+                label = link_id[:size]
+            if not label or label in used:
+                label = str(len(labels) + 1)
+            used.add(label)
+            labels.append(label)
+        return labels
     
     def _rebuild_configs_with_standard_names(self, configs: List[Dict], country: str) -> List[Dict]:
         """Rebuild configs with standard protocol-based naming"""
@@ -92,21 +203,34 @@ class OutputGenerator:
         
         logger.info(f"Rebuilding {len(configs)} configs for {country}...")
         
-        for idx, config in enumerate(configs, 1):
+        for idx, config in zip(self._name_indexes(configs), configs):
             try:
                 cfg_type = str(config.get('type', '')).lower()
 
                 # Shadowsocks را دست نمی‌زنیم (قبلاً ثابت شده درست است)
                 if cfg_type == 'ss':
                     config['rebuilt'] = config.get('original', '')
+                    config['rebuilt_name'] = config.get('name') or f"ss-{country}-{idx}"
                     rebuilt.append(config)
                     continue
 
-                new_name = self._build_standard_name(config, country, idx)
-                logger.debug(f"Config {idx}: New name = {new_name}")
+                link_id = config.get('link_id')
+                cache_key = f"{country}|{idx}|{config.get('cdn') or ''}"
+                cached = self.rebuild_cache.get(link_id, {}).get(cache_key) if link_id else None
+                
+                if cached:
+                    self.rebuild_cache_hits += 1
+                    new_config, new_name = cached
+                else:
+                    new_name = self._build_standard_name(config, country, idx)
+                    logger.debug(f"Config {idx}: New name = {new_name}")
+                    
+                    new_config = self._rebuild_config_with_name(config, new_name)
                 
-                new_config = self._rebuild_config_with_name(config, new_name)
+                if new_config and link_id and cfg_type != 'ssr':
+                    self.rebuild_cache_used.setdefault(link_id, {})[cache_key] = [new_config, new_name]
                 
+                config['rebuilt_name'] = new_name
                 if new_config:
                     config['rebuilt'] = new_config
                     rebuilt.append(config)
@@ -123,7 +247,7 @@ class OutputGenerator:
         logger.info(f"Successfully rebuilt {len(rebuilt)} configs")
         return rebuilt
     
-    def _build_standard_name(self, config: Dict, country: str, idx: int) -> str:
+    def _build_standard_name(self, config: Dict, country: str, idx) -> str:
         protocol = config.get('type', 'unknown').lower()
         
         try:
@@ -444,10 +568,7 @@ class OutputGenerator:
     def _rebuild_vless(self, original: str, new_name: str) -> str:
         try:
             base = original.split('#')[0] if '#' in original else original
-            encoded_name = quote(
-                new_name,
-                safe='🇮🇷🇩🇪🇺🇸🇬🇧🇫🇷🇳🇱🇨🇦🇸🇬🇯🇵🇰🇷🇭🇰🇹🇼🇦🇺🇮🇳🇷🇺🇹🇷🇦🇪🇸🇪🇫🇮🇵🇱🇺🇦🇧🇷🇦🇷🇲🇽🇿🇦🇪🇬🇨🇭🇦🇹🌐-'
-            )
+            encoded_name = _quote_name(new_name)
             return f"{base}#{encoded_name}"
         except Exception as e:
             logger.debug(f"Error rebuilding VLESS: {e}")
@@ -456,10 +577,7 @@ class OutputGenerator:
     def _rebuild_trojan(self, original: str, new_name: str) -> str:
         try:
             base = original.split('#')[0] if '#' in original else original
-            encoded_name = quote(
-                new_name,
-                safe='🇮🇷🇩🇪🇺🇸🇬🇧🇫🇷🇳🇱🇨🇦🇸🇬🇯🇵🇰🇷🇭🇰🇹🇼🇦🇺🇮🇳🇷🇺🇹🇷🇦🇪🇸🇪🇫🇮🇵🇱🇺🇦🇧🇷🇦🇷🇲🇽🇿🇦🇪🇬🇨🇭🇦🇹🌐-'
-            )
+            encoded_name = _quote_name(new_name)
             return f"{base}#{encoded_name}"
         except Exception as e:
             logger.debug(f"Error rebuilding Trojan: {e}")
@@ -468,10 +586,7 @@ class OutputGenerator:
     def _rebuild_shadowsocks(self, original: str, new_name: str) -> str:
         try:
             base = original.split('#')[0] if '#' in original else original
-            encoded_name = quote(
-                new_name,
-                safe='🇮🇷🇩🇪🇺🇸🇬🇧🇫🇷🇳🇱🇨🇦🇸🇬🇯🇵🇰🇷🇭🇰🇹🇼🇦🇺🇮🇳🇷🇺🇹🇷🇦🇪🇸🇪🇫🇮🇵🇱🇺🇦🇧🇷🇦🇷🇲🇽🇿🇦🇪🇬🇨🇭🇦🇹🌐-'
-            )
+            encoded_name = _quote_name(new_name)
             return f"{base}#{encoded_name}"
         except Exception as e:
             logger.debug(f"Error rebuilding SS: {e}")
@@ -483,10 +598,7 @@ class OutputGenerator:
     def _rebuild_hysteria(self, original: str, new_name: str) -> str:
         try:
             base = original.split('#')[0] if '#' in original else original
-            encoded_name = quote(
-                new_name,
-                safe='🇮🇷🇩🇪🇺🇸🇬🇧🇫🇷🇳🇱🇨🇦🇸🇬🇯🇵🇰🇷🇭🇰🇹🇼🇦🇺🇮🇳🇷🇺🇹🇷🇦🇪🇸🇪🇫🇮🇵🇱🇺🇦🇧🇷🇦🇷🇲🇽🇿🇦🇪🇬🇨🇭🇦🇹🌐-'
-            )
+            encoded_name = _quote_name(new_name)
             return f"{base}#{encoded_name}"
         except Exception as e:
             logger.debug(f"Error rebuilding Hysteria: {e}")
@@ -495,16 +607,13 @@ class OutputGenerator:
     def _rebuild_tuic(self, original: str, new_name: str) -> str:
         try:
             base = original.split('#')[0] if '#' in original else original
-            encoded_name = quote(
-                new_name,
-                safe='🇮🇷🇩🇪🇺🇸🇬🇧🇫🇷🇳🇱🇨🇦🇸🇬🇯🇵🇰🇷🇭🇰🇹🇼🇦🇺🇮🇳🇷🇺🇹🇷🇦🇪🇸🇪🇫🇮🇵🇱🇺🇦🇧🇷🇦🇷🇲🇽🇿🇦🇪🇬🇨🇭🇦🇹🌐-'
-            )
+            encoded_name = _quote_name(new_name)
             return f"{base}#{encoded_name}"
         except Exception as e:
             logger.debug(f"Error rebuilding TUIC: {e}")
             return original
     
-    def _generate_json(self, directory: str, filename: str, configs: List[Dict]):
+    def _generate_json(self, directory: str, filename: str, configs: List[Dict], compact: bool = False):
         try:
             filepath = os.path.join(directory, filename)
             
@@ -517,12 +626,19 @@ class OutputGenerator:
             for config in configs:
                 output_config = config.copy()
                 output_config['original'] = config.get('rebuilt', config.get('original', ''))
+                output_config.pop('rebuilt_name', None)
+                if compact:
+                    output_config.pop('rebuilt', None)
                 output_data['configs'].append(output_config)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, ensure_ascii=False, indent=2)
+            if compact:
+                dump_kwargs = {'separators': (',', ':')}
+            else:
+                dump_kwargs = {'indent': 2}
             
-            logger.info(f"✅ Generated JSON: {filepath}")
+            if self.writer.write_json(filepath, output_data, volatile_keys=('updated',),
+                                      volatile_item_keys=OUTPUT_VOLATILE_CONFIG_KEYS, **dump_kwargs):
+                logger.info(f"✅ Generated JSON: {filepath}")
                 
         except Exception as e:
             logger.error(f"Error generating JSON: {e}", exc_info=True)
@@ -531,13 +647,17 @@ class OutputGenerator:
         try:
             filepath = os.path.join(directory, filename)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                for config in configs:
-                    config_str = config.get('rebuilt', config.get('original', ''))
-                    if config_str:
-                        f.write(config_str + '\n')
+            lines = []
+            for config in configs:
+                config_str = config.get('rebuilt', config.get('original', ''))
+                if config_str:
+                    lines.append(config_str + '\n')
             
-            logger.info(f"✅ Generated TXT: {filepath}")
+            content = ''.join(lines)
+            changed = self.writer.write_text(filepath, content)
+            if changed:
+                logger.info(f"✅ Generated TXT: {filepath}")
+            self.writer.write_precompressed(filepath, content.encode('utf-8'), OUTPUT_PRECOMPRESS, changed)
                     
         except Exception as e:
             logger.error(f"Error generating TXT: {e}", exc_info=True)
@@ -559,19 +679,164 @@ class OutputGenerator:
             all_configs = '\n'.join(config_lines)
             encoded = base64.b64encode(all_configs.encode('utf-8')).decode('utf-8')
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(encoded)
-            
-            logger.info(f"✅ Generated Subscription: {filepath}")
+            changed = self.writer.write_text(filepath, encoded)
+            if changed:
+                logger.info(f"✅ Generated Subscription: {filepath}")
+            self.writer.write_precompressed(filepath, encoded.encode('utf-8'), OUTPUT_PRECOMPRESS, changed)
                 
         except Exception as e:
             logger.error(f"Error generating subscription: {e}", exc_info=True)
     
+    def _generate_client_formats(self, country_dir: str, prefix: str, configs: List[Dict]):
+        """Write Clash/sing-box/Xray files straight from the parsed fields"""
+        names = [config.get('rebuilt_name') or config.get('name') or config.get('type', 'proxy')
+                 for config in configs]
+        for exporter in self.exporters:
+            try:
+                filepath = os.path.join(country_dir, prefix + exporter.filename)
+                content = exporter.export(configs, names)
+                if content is None:
+                    continue
+                changed = self.writer.write_text(filepath, content)
+                if changed:
+                    logger.info(f"✅ Generated {exporter.name}: {filepath}")
+                self.writer.write_precompressed(filepath, content.encode('utf-8'), OUTPUT_PRECOMPRESS, changed)
+            except Exception as e:
+                logger.error(f"Error generating {exporter.name} output: {e}", exc_info=True)
+    
+    def _generate_shards(self, country_dir: str, prefix: str, configs: List[Dict]):
+        """Split a large country into small shard subscriptions plus a shards.json index
+
+        Configs are grouped by OUTPUT_SHARD_BY (protocol and/or score tier)
+        and each group is cut into files of at most OUTPUT_SHARD_SIZE configs,
+        keeping the ranked order, so clients can fetch just the slice they need.
+        """
+        try:
+            shard_dir = os.path.join(country_dir, prefix + "shards")
+            index_path = os.path.join(country_dir, prefix + "shards.json")
+            
+            if not OUTPUT_SHARD_SIZE or len(configs) <= OUTPUT_SHARD_SIZE:
+                self._remove_stale_shards(shard_dir, index_path, set())
+                return
+            
+            groups: Dict[tuple, List[Dict]] = {}
+            for config in configs:
+                groups.setdefault(self._shard_group(config), []).append(config)
+            
+            shards = []
+            for group in sorted(groups, key=self._shard_group_order):
+                members = groups[group]
+                label = '-'.join(value for _, value in group) or 'all'
+                for number, start in enumerate(range(0, len(members), OUTPUT_SHARD_SIZE), 1):
+                    chunk = members[start:start + OUTPUT_SHARD_SIZE]
+                    filename = f"{label}-{number}.txt"
+                    self._generate_subscription(shard_dir, filename, chunk)
+                    shard = {'file': f"{prefix}shards/{filename}", 'count': len(chunk)}
+                    shard.update(dict(group))
+                    shards.append(shard)
+            
+            index = {
+                'updated': datetime.utcnow().isoformat(),
+                'count': len(configs),
+                'shard_size': OUTPUT_SHARD_SIZE,
+                'shards': shards,
+            }
+            if self.writer.write_json(index_path, index, volatile_keys=('updated',), indent=2):
+                logger.info(f"✅ Generated {len(shards)} shards: {index_path}")
+            
+            self._remove_stale_shards(shard_dir, index_path,
+                                      {os.path.basename(shard['file']) for shard in shards})
+            
+        except Exception as e:
+            logger.error(f"Error generating shards: {e}", exc_info=True)
+    
+    def _shard_group(self, config: Dict) -> tuple:
+        group = []
+        if "protocol" in OUTPUT_SHARD_BY:
+            group.append(('protocol', str(config.get('type', 'unknown')).lower()))
+        if "tier" in OUTPUT_SHARD_BY:
+            score = config.get('score') or 0.0
+            tier = next((name for name, minimum in OUTPUT_SCORE_TIERS.items() if score >= minimum),
+                        list(OUTPUT_SCORE_TIERS)[-1])
+            group.append(('tier', tier))
+        return tuple(group)
+    
+    @staticmethod
+    def _shard_group_order(group: tuple) -> tuple:
+        # Protocols alphabetically, tiers best first
+        tiers = list(OUTPUT_SCORE_TIERS)
+        return tuple(tiers.index(value) if key == 'tier' else value for key, value in group)
+    
+    @staticmethod
+    def _remove_stale_shards(shard_dir: str, index_path: str, keep: set):
+        """Delete shard files (and their .gz/.br siblings) left over from larger runs"""
+        if not keep and os.path.exists(index_path):
+            os.remove(index_path)
+        if not os.path.isdir(shard_dir):
+            return
+        for filename in os.listdir(shard_dir):
+            base = filename
+            for encoding in OUTPUT_PRECOMPRESS:
+                if base.endswith('.' + encoding):
+                    base = base[:-len(encoding) - 1]
+            if base not in keep:
+                os.remove(os.path.join(shard_dir, filename))
+        if not os.listdir(shard_dir):
+            os.rmdir(shard_dir)
+    
+    def _generate_deltas(self, stats: List[Dict]):
+        """Write <prefix>delta.json per output: fingerprints added/removed since the last run"""
+        try:
+            fingerprints = OutputFingerprints()
+            current = set()
+            
+            for item in stats:
+                if not item['links']:
+                    continue
+                country_dir, prefix = self._output_location(item['country'], item['tested'])
+                output = os.path.relpath(country_dir, OUTPUT_DIR).replace(os.sep, '/')
+                current.add(output)
+                
+                delta = fingerprints.delta(output, item['links'])
+                if delta is None:
+                    continue
+                
+                delta_data = {
+                    'updated': datetime.utcnow().isoformat(),
+                    'count': len(item['links']),
+                    'added': delta['added'],
+                    'removed': delta['removed'],
+                }
+                self.writer.write_json(os.path.join(country_dir, prefix + "delta.json"), delta_data,
+                                       volatile_keys=('updated',), indent=2)
+            
+            fingerprints.outputs = {output: fps for output, fps in fingerprints.outputs.items()
+                                    if output in current}
+            fingerprints.save()
+            
+        except Exception as e:
+            logger.error(f"Error generating deltas: {e}", exc_info=True)
+    
+    def _generate_manifest(self):
+        """Write output/manifest.json with the hash, size, mtime and count of every file"""
+        try:
+            manifest_path = os.path.join(OUTPUT_DIR, MANIFEST_NAME)
+            manifest = {
+                'updated': datetime.utcnow().isoformat(),
+                'files': build_manifest(OUTPUT_DIR, previous=load_manifest(manifest_path)),
+            }
+            if self.writer.write_json(manifest_path, manifest, volatile_keys=('updated',),
+                                      indent=2, sort_keys=True):
+                logger.info(f"✅ Generated manifest: {manifest_path}")
+                
+        except Exception as e:
+            logger.error(f"Error generating manifest: {e}", exc_info=True)
+    
     def _generate_readme(self, all_configs: Dict, tested_configs: Dict):
         try:
             readme_path = os.path.join(OUTPUT_DIR, 'README.md')
             
-            with open(readme_path, 'w', encoding='utf-8') as f:
+            with io.StringIO() as f:
                 f.write("# 🌐 Free Proxy Configs\n\n")
                 f.write(f"**Last Updated:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n\n")
                 
@@ -622,12 +887,46 @@ class OutputGenerator:
                         f.write(f"- **Count:** {count}\n")
                         f.write(f"- [JSON](others/{country.lower()}/configs.json) | ")
                         f.write(f"[TXT](others/{country.lower()}/configs.txt) | ")
-                        f.write(f"[Subscription](others/{country.lower()}/subscription.txt)\n\n")
+                        f.write(f"[Subscription](others/{country.lower()}/subscription.txt)")
+                        tested_count = len(tested_configs.get(country, []))
+                        if tested_count > 0:
+                            f.write(f" | [Tested Subscription](tested/{country.lower()}/tested_subscription.txt) ✅ ({tested_count})")
+                        f.write("\n\n")
                 
                 f.write("\n---\n")
                 f.write("*🤖 Auto-updated every 8 hours via GitHub Actions*\n")
+                content = f.getvalue()
             
-            logger.info(f"✅ Generated README: {readme_path}")
+            if self.writer.write_text(readme_path, content, volatile_pattern=r'^\*\*Last Updated:\*\*.*$'):
+                logger.info(f"✅ Generated README: {readme_path}")
                 
         except Exception as e:
             logger.error(f"Error generating README: {e}", exc_info=True)
+
+
+def _generate_country_job(scorer: QualityScorer, country: str, configs: List[Dict],
+                          tested: bool, rebuild_cache: Dict[str, Dict[str, list]]) -> Dict:
+    """Worker entry point: generate one country's files and report what happened
+
+    Configs are copied because the same dicts appear in both the "all" and
+    "tested" outputs and ranking/rebuilding writes into them.
+    """
+    start = time.perf_counter()
+    generator = OutputGenerator(scorer=scorer, rebuild_cache=rebuild_cache)
+    rebuilt = generator._generate_country_outputs(country, [dict(c) for c in configs], tested=tested)
+    links = {}
+    for config in rebuilt:
+        link = config.get('rebuilt', config.get('original', ''))
+        links[config.get('link_id') or link_fingerprint(config.get('original', ''))] = link
+    return {
+        'country': country,
+        'tested': tested,
+        'count': len(rebuilt),
+        'links': links,
+        'written': generator.writer.written,
+        'skipped': generator.writer.skipped,
+        'cache_hits': generator.rebuild_cache_hits,
+        'rebuild_cache': generator.rebuild_cache_used,
+        # timed here because metrics recorded in a worker process would be lost
+        'seconds': time.perf_counter() - start,
+    }
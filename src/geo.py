@@ -0,0 +1,278 @@
+"""
+Geo module with pluggable IP geolocation providers
+"""
+
+import json
+import logging
+from abc import ABC, abstractmethod
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from .config import *
+from .iprange import IPRangeIndex
+from .metrics import METRICS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class GeoProvider(ABC):
+    """Base class for geolocation providers
+
+    Subclasses implement `_fetch` for one chunk of at most `batch_size` IPs.
+    Providers that can't batch (batch_size 1) are queried from MAX_WORKERS
+    threads at once; real batch endpoints get their chunks one after another.
+    `quota` caps the number of lookup requests a provider may make per run
+    (None means unlimited).
+    """
+
+    name = "base"
+    batch_size = 1
+
+    def __init__(self, quota: Optional[int] = None):
+        self.quota = quota
+        self.requests_made = 0
+        self._lock = threading.Lock()
+
+    def exhausted(self) -> bool:
+        """Whether the provider has used up its quota"""
+        return self.quota is not None and self.requests_made >= self.quota
+
+    def _reserve_request(self) -> bool:
+        with self._lock:
+            if self.exhausted():
+                return False
+            self.requests_made += 1
+            return True
+
+    def lookup_batch(self, ips: List[str]) -> Dict[str, str]:
+        """Look up many IPs, returning country codes for the ones found"""
+        results = {}
+        chunks = [ips[start:start + self.batch_size] for start in range(0, len(ips), self.batch_size)]
+
+        if self.batch_size == 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(chunks))) as executor:
+                for found in executor.map(self._lookup_chunk, chunks):
+                    results.update(found or {})
+        else:
+            for chunk in chunks:
+                found = self._lookup_chunk(chunk)
+                if found is None:
+                    break
+                results.update(found)
+
+        if self.exhausted() and len(results) < len(ips):
+            logger.warning(f"Geo provider {self.name} reached its quota of {self.quota} requests")
+        return results
+
+    def _lookup_chunk(self, chunk: List[str]) -> Optional[Dict[str, str]]:
+        """One request's worth of IPs; None once the quota is used up"""
+        if not self._reserve_request():
+            return None
+        try:
+            with METRICS.timer("geo_request_seconds", provider=self.name):
+                found = self._fetch(chunk)
+        except Exception as e:
+            logger.debug(f"Geo provider {self.name} failed for {len(chunk)} IPs: {e}")
+            METRICS.incr("geo_requests_total", provider=self.name, outcome='error')
+            return {}
+        METRICS.incr("geo_requests_total", provider=self.name, outcome='ok')
+        METRICS.incr("geo_ips_total", len(found), provider=self.name, outcome='found')
+        METRICS.incr("geo_ips_total", len(chunk) - len(found), provider=self.name, outcome='missed')
+        return found
+
+    @abstractmethod
+    def _fetch(self, ips: List[str]) -> Dict[str, str]:
+        """Country codes for one chunk of IPs, keyed by IP"""
+
+
+class IpInfoProvider(GeoProvider):
+    """ipinfo.io provider (also speaks to ipinfo-compatible stand-ins)
+
+    Without a token ipinfo only offers one IP per request; with a token (or a
+    local stand-in) the `/batch` endpoint resolves up to 1000 IPs at once.
+    """
+
+    name = "ipinfo"
+
+    def __init__(self, base_url: str = "https://ipinfo.io", token: str = "",
+                 batch: bool = False, quota: Optional[int] = None, timeout: int = 5):
+        super().__init__(quota)
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.batch = batch or bool(token)
+        self.batch_size = 1000 if self.batch else 1
+        self.timeout = timeout
+        self.session = requests.Session()
+        # single-IP lookups run from MAX_WORKERS threads, keep a connection for each
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=MAX_WORKERS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _fetch(self, ips: List[str]) -> Dict[str, str]:
+        params = {'token': self.token} if self.token else None
+
+        if not self.batch:
+            ip = ips[0]
+            response = self.session.get(f"{self.base_url}/{ip}/json", params=params,
+                                        timeout=self.timeout)
+            if response.status_code == 200:
+                country = response.json().get('country')
+                if country:
+                    return {ip: country}
+            return {}
+
+        response = self.session.post(f"{self.base_url}/batch", params=params,
+                                     json=[f"{ip}/country" for ip in ips],
+                                     timeout=self.timeout * 4)
+        if response.status_code != 200:
+            return {}
+
+        results = {}
+        for key, country in response.json().items():
+            ip = key.rsplit('/', 1)[0]
+            if isinstance(country, str) and country:
+                results[ip] = country.strip()
+        return results
+
+
+class IpApiProvider(GeoProvider):
+    """ip-api.com provider using its batch endpoint (100 IPs per request)"""
+
+    name = "ip-api"
+    batch_size = 100
+
+    def __init__(self, base_url: str = "http://ip-api.com", quota: Optional[int] = None,
+                 timeout: int = 10):
+        super().__init__(quota)
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _fetch(self, ips: List[str]) -> Dict[str, str]:
+        payload = [{'query': ip, 'fields': 'status,countryCode,query'} for ip in ips]
+        response = self.session.post(f"{self.base_url}/batch", json=payload, timeout=self.timeout)
+        if response.status_code != 200:
+            return {}
+
+        results = {}
+        for item in response.json():
+            if item.get('status') == 'success' and item.get('countryCode'):
+                results[item['query']] = item['countryCode']
+        return results
+
+
+class FileGeoProvider(GeoProvider):
+    """Offline provider backed by a local file
+
+    Accepts either a JSON object mapping IPs to country codes or a text/CSV
+    file with one `cidr,country` pair per line (IPv4 and IPv6).
+    """
+
+    name = "file"
+
+    def __init__(self, path: str, quota: Optional[int] = None):
+        super().__init__(quota)
+        self.batch_size = 10000
+        self.path = path
+        self.exact: Dict[str, str] = {}
+        self.ranges = IPRangeIndex()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except Exception as e:
+            logger.warning(f"Could not read geo file {self.path}: {e}")
+            return
+
+        if content.lstrip().startswith('{'):
+            self.exact = {ip: cc for ip, cc in json.loads(content).items() if cc}
+            logger.info(f"Loaded {len(self.exact)} IPs from {self.path}")
+            return
+
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line.startswith('#') or ',' not in line:
+                continue
+            cidr, country = [part.strip() for part in line.split(',', 1)]
+            if country:
+                self.ranges.add(cidr, country.upper())
+        logger.info(f"Loaded {len(self.ranges)} geo ranges from {self.path}")
+
+    def _lookup_one(self, ip: str) -> Optional[str]:
+        if ip in self.exact:
+            return self.exact[ip]
+        return self.ranges.lookup(ip)
+
+    def _fetch(self, ips: List[str]) -> Dict[str, str]:
+        results = {}
+        for ip in ips:
+            country = self._lookup_one(ip)
+            if country:
+                results[ip] = country
+        return results
+
+
+class GeoChain:
+    """Ordered list of providers; later providers only see IPs earlier ones missed"""
+
+    def __init__(self, providers: List[GeoProvider]):
+        self.providers = providers
+        self.cache: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, ips: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Return a country code (or None) for every requested IP"""
+        wanted = list(dict.fromkeys(ips))
+        with self._lock:
+            pending = [ip for ip in wanted if ip not in self.cache]
+        METRICS.incr("geo_cache_total", len(wanted) - len(pending), outcome='hit')
+        METRICS.incr("geo_cache_total", len(pending), outcome='miss')
+
+        for provider in self.providers:
+            if not pending:
+                break
+            if provider.exhausted():
+                continue
+            found = provider.lookup_batch(pending)
+            if found:
+                logger.debug(f"Geo provider {provider.name} resolved {len(found)}/{len(pending)} IPs")
+            with self._lock:
+                self.cache.update(found)
+            pending = [ip for ip in pending if ip not in found]
+
+        with self._lock:
+            for ip in pending:
+                self.cache[ip] = None
+            return {ip: self.cache.get(ip) for ip in wanted}
+
+    def lookup_one(self, ip: str) -> Optional[str]:
+        return self.lookup([ip]).get(ip)
+
+
+def build_geo_chain(names: Optional[List[str]] = None) -> GeoChain:
+    """Build the provider chain from GEO_PROVIDERS and its settings"""
+    providers = []
+
+    for name in names if names is not None else GEO_PROVIDERS:
+        quota = GEO_PROVIDER_QUOTAS.get(name)
+        try:
+            if name == "file":
+                if GEO_DB_FILE:
+                    providers.append(FileGeoProvider(GEO_DB_FILE, quota=quota))
+            elif name == "mock":
+                if GEO_MOCK_URL:
+                    providers.append(IpInfoProvider(GEO_MOCK_URL, batch=True, quota=quota))
+            elif name == "ipinfo":
+                providers.append(IpInfoProvider(token=IPINFO_TOKEN, quota=quota))
+            elif name == "ip-api":
+                providers.append(IpApiProvider(quota=quota))
+            else:
+                logger.warning(f"Unknown geo provider: {name}")
+        except Exception as e:
+            logger.warning(f"Could not set up geo provider {name}: {e}")
+
+    return GeoChain(providers)
@@ -0,0 +1,157 @@
+"""
+History module for persisting per-endpoint test results between runs
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+from .config import (HISTORY_FILE, HISTORY_MAX_AGE_DAYS, RETEST_BASE_HOURS,
+                     RETEST_MAX_FACTOR)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TestHistory:
+    """Per-endpoint test history with adaptive retest scheduling
+
+    Every endpoint keeps its last result, a streak (+n successes or -n
+    failures in a row), its last RTT and how often the result flipped.
+    Endpoints with long streaks either way are retested less often; new and
+    flapping endpoints are retested every run.
+    """
+
+    def __init__(self, path: str = HISTORY_FILE):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        self.load()
+
+    @staticmethod
+    def endpoint_key(endpoint: tuple) -> str:
+        """Turn a tester endpoint (ip, port, probe) into a stable string key"""
+        host, port, kind = endpoint
+        parts = [kind[0]] + [','.join(p) if isinstance(p, tuple) else str(p) for p in kind[1:]]
+        return f"{host}|{port}|{':'.join(parts)}"
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('endpoints', {})
+            logger.info(f"Loaded test history for {len(self.entries)} endpoints")
+        except Exception as e:
+            logger.warning(f"Could not load test history {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            self.prune()
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'endpoints': self.entries}, f, separators=(',', ':'), sort_keys=True)
+            os.replace(tmp_path, self.path)
+            logger.info(f"Saved test history for {len(self.entries)} endpoints")
+        except Exception as e:
+            logger.warning(f"Could not save test history {self.path}: {e}")
+
+    def prune(self, now: Optional[float] = None):
+        """Forget endpoints that haven't been tested for HISTORY_MAX_AGE_DAYS"""
+        now = now or time.time()
+        cutoff = now - HISTORY_MAX_AGE_DAYS * 86400
+        stale = [key for key, entry in self.entries.items() if entry.get('last_tested', 0) < cutoff]
+        for key in stale:
+            del self.entries[key]
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.entries.get(key)
+
+    def record(self, key: str, result: Dict, now: Optional[float] = None):
+        """Store a fresh probe result for an endpoint"""
+        now = now or time.time()
+        entry = self.entries.get(key)
+        working = bool(result.get('working'))
+
+        if entry is None:
+            entry = {'first_seen': now, 'tests': 0, 'successes': 0, 'flips': 0, 'streak': 0}
+            self.entries[key] = entry
+        elif entry.get('last_result') is not None and entry['last_result'] != working:
+            entry['flips'] = entry.get('flips', 0) + 1
+
+        streak = entry.get('streak', 0)
+        if working:
+            entry['streak'] = streak + 1 if streak > 0 else 1
+        else:
+            entry['streak'] = streak - 1 if streak < 0 else -1
+
+        entry['tests'] = entry.get('tests', 0) + 1
+        entry['successes'] = entry.get('successes', 0) + int(working)
+        entry['last_result'] = working
+        entry['last_tested'] = now
+        entry['latency_ms'] = result.get('latency_ms')
+        entry['jitter_ms'] = result.get('jitter_ms')
+        entry['loss'] = result.get('loss')
+
+    def uptime(self, key: str) -> Optional[float]:
+        """Fraction of past tests that succeeded, or None if never tested"""
+        entry = self.entries.get(key)
+        if not entry or not entry.get('tests'):
+            return None
+        return entry.get('successes', 0) / entry['tests']
+
+    def prior(self, key: str) -> float:
+        """Prior chance that an endpoint works: 0.5 if unknown, else uptime blended with the last result"""
+        entry = self.entries.get(key)
+        if not entry or not entry.get('tests'):
+            return 0.5
+        uptime = entry.get('successes', 0) / entry['tests']
+        return 0.5 * uptime + 0.5 * (1.0 if entry.get('last_result') else 0.0)
+
+    def retest_interval(self, key: str) -> float:
+        """Seconds until an endpoint should be retested"""
+        entry = self.entries.get(key)
+        base = RETEST_BASE_HOURS * 3600
+        if not entry:
+            return 0.0
+
+        tests = max(entry.get('tests', 1), 1)
+        if tests >= 3 and entry.get('flips', 0) / tests >= 0.3:
+            return base
+
+        run_length = abs(entry.get('streak', 0))
+        if run_length < 3:
+            return base
+        return base * min(2 ** (run_length - 2), RETEST_MAX_FACTOR)
+
+    def staleness(self, key: str, now: Optional[float] = None) -> float:
+        """How overdue an endpoint is: 0 = just tested, >= 1 = due, inf = never tested"""
+        now = now or time.time()
+        entry = self.entries.get(key)
+        if not entry:
+            return float('inf')
+        interval = self.retest_interval(key)
+        if interval <= 0:
+            return float('inf')
+        return (now - entry.get('last_tested', 0)) / interval
+
+    def schedule(self, keys: List[str], budget: Optional[int] = None,
+                 now: Optional[float] = None) -> List[str]:
+        """Pick which endpoints to probe this run, most overdue first
+
+        Endpoints that aren't due yet are skipped; `budget` caps how many
+        get probed even when more are due.
+        """
+        now = now or time.time()
+        # A small slack so runs that fire a bit early still retest per-run endpoints
+        due = [(self.staleness(key, now), key) for key in keys]
+        due = [(score, key) for score, key in due if score >= 0.9]
+        due.sort(key=lambda item: -item[0])
+        selected = [key for _, key in due]
+        if budget is not None:
+            selected = selected[:max(budget, 0)]
+        return selected
@@ -0,0 +1,114 @@
+"""
+IP range index for fast IPv4/IPv6 CIDR lookups
+"""
+
+import bisect
+import ipaddress
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Union
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class IPRangeIndex:
+    """Dual-stack CIDR -> value index
+
+    Ranges are flattened into sorted, non-overlapping segments per IP version
+    so a lookup is one binary search regardless of table size. When ranges
+    nest, the most specific one wins; for identical ranges the first added wins.
+    """
+
+    def __init__(self, ranges: Optional[Iterable[tuple]] = None):
+        self._pending: List[tuple] = []
+        self._starts: Dict[int, List[int]] = {4: [], 6: []}
+        self._ends: Dict[int, List[int]] = {4: [], 6: []}
+        self._values: Dict[int, list] = {4: [], 6: []}
+        self._dirty = False
+        self._lock = threading.Lock()
+        for cidr, value in ranges or []:
+            self.add(cidr, value)
+
+    def add(self, cidr: str, value) -> bool:
+        """Add a CIDR (or single address); returns False if it doesn't parse"""
+        try:
+            network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+        except ValueError:
+            return False
+        self._pending.append((network.version, int(network.network_address),
+                              int(network.broadcast_address), len(self._pending), value))
+        self._dirty = True
+        return True
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _build(self):
+        with self._lock:
+            if self._dirty:
+                self._build_segments()
+
+    def _build_segments(self):
+        for version in (4, 6):
+            ranges = sorted((r for r in self._pending if r[0] == version),
+                            key=lambda r: (r[1], -r[2], -r[3]))
+            segments = []
+            stack = []
+            cursor = 0
+
+            def emit(start, end, value):
+                if start > end:
+                    return
+                if segments and segments[-1][1] == start - 1 and segments[-1][2] == value:
+                    segments[-1] = (segments[-1][0], end, value)
+                else:
+                    segments.append((start, end, value))
+
+            for _, start, end, _, value in ranges:
+                while stack and stack[-1][0] < start:
+                    top_end, top_value = stack.pop()
+                    emit(cursor, top_end, top_value)
+                    cursor = max(cursor, top_end + 1)
+                if stack:
+                    emit(cursor, start - 1, stack[-1][1])
+                stack.append((end, value))
+                cursor = start
+
+            while stack:
+                top_end, top_value = stack.pop()
+                emit(cursor, top_end, top_value)
+                cursor = max(cursor, top_end + 1)
+
+            self._starts[version] = [s[0] for s in segments]
+            self._ends[version] = [s[1] for s in segments]
+            self._values[version] = [s[2] for s in segments]
+
+        self._dirty = False
+
+    def lookup(self, ip: Union[str, ipaddress.IPv4Address, ipaddress.IPv6Address]):
+        """Return the value of the most specific range containing `ip`, or None"""
+        if self._dirty:
+            self._build()
+        try:
+            ip_obj = ip if not isinstance(ip, str) else ipaddress.ip_address(ip.strip('[]'))
+        except ValueError:
+            return None
+
+        if ip_obj.version == 6 and ip_obj.ipv4_mapped:
+            ip_obj = ip_obj.ipv4_mapped
+
+        version = ip_obj.version
+        value = int(ip_obj)
+        pos = bisect.bisect_right(self._starts[version], value) - 1
+        if pos >= 0 and value <= self._ends[version][pos]:
+            return self._values[version][pos]
+        return None
+
+    def __contains__(self, ip) -> bool:
+        return self.lookup(ip) is not None
+
+    def segment_count(self) -> int:
+        if self._dirty:
+            self._build()
+        return len(self._starts[4]) + len(self._starts[6])
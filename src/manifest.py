@@ -0,0 +1,146 @@
+"""
+Manifest module: per-file hashes of the output tree and per-country deltas
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+from .config import OUTPUT_FINGERPRINTS_FILE, OUTPUT_PRECOMPRESS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _count_configs(path: str, data: bytes) -> Optional[int]:
+    """Number of configs in an output file, or None when it doesn't hold configs"""
+    if path.endswith('.json'):
+        try:
+            count = json.loads(data).get('count')
+            return count if isinstance(count, int) else None
+        except (ValueError, AttributeError):
+            return None
+    if not path.endswith('.txt'):
+        return None
+
+    text = data.decode('utf-8', errors='replace')
+    if '://' not in text:
+        # base64 subscription
+        try:
+            text = base64.b64decode(text.strip()).decode('utf-8', errors='replace')
+        except (binascii.Error, ValueError):
+            return None
+    return sum(1 for line in text.splitlines() if line.strip())
+
+
+def load_manifest(path: str) -> Dict[str, Dict]:
+    """The `files` section of an earlier manifest, or {} when there is none"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except Exception as e:
+        logger.warning(f"Could not load previous manifest {path}: {e}")
+        return {}
+
+
+def build_manifest(output_dir: str, previous: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+    """Describe every file under `output_dir`: sha256, size, mtime and config count
+
+    mtime is when the content last changed: a file whose sha256 matches its
+    entry in `previous` keeps the earlier mtime, since a fresh checkout
+    touches every file. Precompressed siblings aren't listed separately;
+    their encodings are noted on the file they belong to.
+    """
+    previous = previous or {}
+    files: Dict[str, Dict] = {}
+    suffixes = tuple('.' + encoding for encoding in OUTPUT_PRECOMPRESS)
+
+    for root, dirs, names in os.walk(output_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, output_dir).replace(os.sep, '/')
+            if rel_path == MANIFEST_NAME or name.startswith('.') or name.endswith(suffixes):
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                stat = os.stat(path)
+            except OSError as e:
+                logger.debug(f"Skipping {path} in manifest: {e}")
+                continue
+
+            sha256 = hashlib.sha256(data).hexdigest()
+            mtime = int(stat.st_mtime)
+            earlier = previous.get(rel_path)
+            if earlier and earlier.get('sha256') == sha256 and isinstance(earlier.get('mtime'), int):
+                mtime = earlier['mtime']
+            entry = {
+                'sha256': sha256,
+                'size': len(data),
+                'mtime': mtime,
+            }
+            count = _count_configs(name, data)
+            if count is not None:
+                entry['count'] = count
+            encodings = [encoding for encoding in OUTPUT_PRECOMPRESS if os.path.exists(f"{path}.{encoding}")]
+            if encodings:
+                entry['encodings'] = encodings
+            files[rel_path] = entry
+
+    return files
+
+
+class OutputFingerprints:
+    """Fingerprints published per output (e.g. "others/us", "tested/ir") in the last run"""
+
+    def __init__(self, path: str = OUTPUT_FINGERPRINTS_FILE):
+        self.path = path
+        self.outputs: Dict[str, List[str]] = {}
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.outputs = json.load(f).get('outputs', {})
+        except Exception as e:
+            logger.warning(f"Could not load output fingerprints {self.path}: {e}")
+            self.outputs = {}
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'outputs': self.outputs}, f, separators=(',', ':'), sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save output fingerprints {self.path}: {e}")
+
+    def delta(self, output: str, links: Dict[str, str]) -> Optional[Dict]:
+        """Diff an output's current {fingerprint: link} against the last run and remember it
+
+        Returns None the first time an output is seen, since there's nothing
+        to diff against.
+        """
+        previous = self.outputs.get(output)
+        self.outputs[output] = sorted(links)
+        if previous is None:
+            return None
+
+        previous_set = set(previous)
+        return {
+            'added': [{'fingerprint': fp, 'link': links[fp]} for fp in sorted(links) if fp not in previous_set],
+            'removed': sorted(previous_set.difference(links)),
+        }
@@ -0,0 +1,234 @@
+"""
+Metrics module: counters, timers and histograms for the per-run report
+"""
+
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from .config import METRICS_PREFIX
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the timer buckets; a final +Inf bucket is implied
+TIMER_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Upper bounds for plain histograms (sizes, counts)
+SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 6)
+
+
+class _Histogram:
+    """Bucket counts plus count/sum/min/max; quantiles are estimated from the buckets"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (capped at the observed max)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'min': _round(self.min),
+            'max': _round(self.max),
+            'mean': round(self.total / self.count, 6) if self.count else None,
+            'p50': _round(self.quantile(0.5)),
+            'p95': _round(self.quantile(0.95)),
+            'p99': _round(self.quantile(0.99)),
+        }
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters, timers and histograms
+
+    Timers are histograms of durations in seconds. Every series is keyed by
+    name plus keyword labels, e.g. `incr("fetches_total", kind="github",
+    outcome="ok")`. The registry lives for one process; call `reset()`
+    between runs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._counters: Dict[str, Dict[LabelKey, float]] = {}
+            self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+            self._kinds: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(labels: Dict) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def incr(self, name: str, n: float = 1, **labels):
+        """Add `n` to a counter"""
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + n
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = SIZE_BUCKETS, **labels):
+        """Record a value in a histogram"""
+        self._observe(name, value, buckets, 'histogram', labels)
+
+    def _observe(self, name: str, value: float, buckets: Tuple[float, ...], kind: str, labels: Dict):
+        key = self._key(labels)
+        with self._lock:
+            self._kinds.setdefault(name, kind)
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def record_time(self, name: str, seconds: float, **labels):
+        """Record a duration measured elsewhere (e.g. in a worker process)"""
+        self._observe(name, seconds, TIMER_BUCKETS, 'timer', labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time the block, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """Decorator version of `timer`"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record_time(name, time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    def counter(self, name: str, **labels) -> float:
+        key = self._key(labels)
+        with self._lock:
+            return self._counters.get(name, {}).get(key, 0)
+
+    def report(self, **info) -> Dict:
+        """Snapshot of every series as JSON-ready data; `info` is added at the top"""
+        with self._lock:
+            report = {
+                'started': datetime.utcfromtimestamp(self.started).isoformat(),
+                'finished': datetime.utcnow().isoformat(),
+                'duration_s': round(time.time() - self.started, 3),
+            }
+            report.update(info)
+            report['counters'] = {
+                name: [{'labels': dict(key), 'value': value} for key, value in sorted(series.items())]
+                for name, series in sorted(self._counters.items())
+            }
+            for kind, section in (('timer', 'timers'), ('histogram', 'histograms')):
+                report[section] = {
+                    name: [dict(labels=dict(key), **histogram.summary()) for key, histogram in sorted(series.items())]
+                    for name, series in sorted(self._histograms.items()) if self._kinds[name] == kind
+                }
+        return report
+
+    def prometheus(self, prefix: str = METRICS_PREFIX) -> str:
+        """All series in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def series_name(name: str) -> str:
+            return f"{prefix}_{name}" if prefix else name
+
+        def label_text(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ''
+            escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+            return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = series_name(name)
+                lines.append(f"# TYPE {full} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full}{label_text(key)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                full = series_name(name)
+                lines.append(f"# TYPE {full} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += n
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append(f"{full}_bucket{label_text(key, (('le', le),))} {cumulative}")
+                    lines.append(f"{full}_sum{label_text(key)} {histogram.total}")
+                    lines.append(f"{full}_count{label_text(key)} {histogram.count}")
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _write(path: str, text: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def write_report(self, path: str, prometheus_path: str = "", **info):
+        """Write the JSON run report, and the Prometheus textfile when a path is given"""
+        try:
+            self._write(path, json.dumps(self.report(**info), indent=2, ensure_ascii=False))
+            logger.info(f"✅ Generated run report: {path}")
+        except Exception as e:
+            logger.warning(f"Could not write run report {path}: {e}")
+
+        if not prometheus_path:
+            return
+        try:
+            self._write(prometheus_path, self.prometheus())
+        except Exception as e:
+            logger.warning(f"Could not write Prometheus metrics {prometheus_path}: {e}")
+
+
+# Process-wide registry used by all modules
+METRICS = Metrics()
@@ -9,6 +9,8 @@ import logging
 import html
 from typing import Dict, Optional
 from urllib.parse import urlparse, parse_qs, unquote
+from .fingerprint import link_fingerprint
+from .metrics import METRICS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -53,28 +55,40 @@ class ConfigParser:
         return name.strip()
 
     @staticmethod
+    @METRICS.timed("parse_seconds")
     def parse_config(config: str) -> Optional[Dict]:
         """Parse a proxy config and extract information"""
+        scheme = 'unknown'
         try:
             config = config.strip()
-            if config.startswith('vmess://'):
-                return ConfigParser._parse_vmess(config)
-            elif config.startswith('vless://'):
-                return ConfigParser._parse_vless(config)
-            elif config.startswith('trojan://'):
-                return ConfigParser._parse_trojan(config)
-            elif config.startswith('ss://'):
-                return ConfigParser._parse_shadowsocks(config)
-            elif config.startswith('ssr://'):
-                return ConfigParser._parse_ssr(config)
-            elif config.startswith('hysteria://') or config.startswith('hysteria2://'):
-                return ConfigParser._parse_hysteria(config)
-            elif config.startswith('tuic://'):
-                return ConfigParser._parse_tuic(config)
-            else:
-                return None
+            scheme = config.split('://', 1)[0].lower()
+            parsed = ConfigParser._parse_by_scheme(config)
+            if parsed:
+                parsed['link_id'] = link_fingerprint(config)
+            METRICS.incr("parse_total", scheme=scheme, outcome='ok' if parsed else 'invalid')
+            return parsed
         except Exception as e:
             logger.debug(f"Error parsing config: {e}")
+            METRICS.incr("parse_total", scheme=scheme, outcome='error')
+            return None
+    
+    @staticmethod
+    def _parse_by_scheme(config: str) -> Optional[Dict]:
+        if config.startswith('vmess://'):
+            return ConfigParser._parse_vmess(config)
+        elif config.startswith('vless://'):
+            return ConfigParser._parse_vless(config)
+        elif config.startswith('trojan://'):
+            return ConfigParser._parse_trojan(config)
+        elif config.startswith('ss://'):
+            return ConfigParser._parse_shadowsocks(config)
+        elif config.startswith('ssr://'):
+            return ConfigParser._parse_ssr(config)
+        elif config.startswith('hysteria://') or config.startswith('hysteria2://'):
+            return ConfigParser._parse_hysteria(config)
+        elif config.startswith('tuic://'):
+            return ConfigParser._parse_tuic(config)
+        else:
             return None
     
     @staticmethod
@@ -98,6 +112,13 @@ class ConfigParser:
                 'network': data.get('net', ''),
                 'host': data.get('host', ''),
                 'sni': data.get('sni', ''),
+                'security': str(data.get('tls', '') or '').lower(),
+                'alpn': data.get('alpn', ''),
+                'path': data.get('path', ''),
+                'headerType': str(data.get('type', '') or '').lower(),
+                'alterId': str(data.get('aid', '0') or '0'),
+                'cipher': data.get('scy', '') or 'auto',
+                'fingerprint': str(data.get('fp', '') or '').lower(),
                 'original': config
             }
         except Exception as e:
@@ -155,9 +176,20 @@ class ConfigParser:
             # sni
             sni = params.get('sni', [''])[0]
 
+            # alpn: h2,http/1.1
+            alpn = params.get('alpn', [''])[0]
+
             # header host / authority
             host_header = params.get('host', [''])[0] or params.get('authority', [''])[0]
 
+            # ws/httpupgrade/xhttp path and gRPC service name
+            path = params.get('path', [''])[0]
+            service_name = params.get('serviceName', [''])[0]
+
+            # reality
+            public_key = params.get('pbk', [''])[0]
+            short_id = params.get('sid', [''])[0]
+
             # در برخی لینک‌ها uuid در query با id آمده
             if not uuid:
                 uuid = params.get('id', [''])[0]
@@ -176,6 +208,11 @@ class ConfigParser:
                 'encryption': encryption,
                 'headerType': header_type,
                 'fingerprint': fingerprint,
+                'alpn': alpn,
+                'path': path,
+                'serviceName': service_name,
+                'publicKey': public_key,
+                'shortId': short_id,
                 'original': config
             }
 
@@ -187,7 +224,7 @@ class ConfigParser:
     def _parse_trojan(config: str) -> Optional[Dict]:
         """Parse Trojan config"""
         try:
-            pattern = r'trojan://([^@]+)@([^:]+):(\d+)\??([^#]*)#?(.*)'
+            pattern = r'trojan://([^@]+)@(\[[0-9a-fA-F:.]+\]|[^:]+):(\d+)\??([^#]*)#?(.*)'
             match = re.match(pattern, config)
             
             if not match:
@@ -198,12 +235,19 @@ class ConfigParser:
             
             return {
                 'type': 'trojan',
-                'address': address,
+                'address': address.strip('[]'),
                 'port': port,
                 'password': password,
                 'name': ConfigParser._clean_name(name),
                 'sni': params_dict.get('sni', [''])[0],
                 'host': params_dict.get('host', [''])[0],
+                # trojan always runs over TLS unless the link says otherwise
+                'security': (params_dict.get('security', [''])[0] or 'tls').lower(),
+                'alpn': params_dict.get('alpn', [''])[0],
+                'network': params_dict.get('type', [''])[0].lower(),
+                'path': params_dict.get('path', [''])[0],
+                'serviceName': params_dict.get('serviceName', [''])[0],
+                'fingerprint': params_dict.get('fp', [''])[0].lower(),
                 'original': config
             }
         except Exception as e:
@@ -222,6 +266,13 @@ class ConfigParser:
                 clean_config, name_raw = clean_config.split('#', 1)
                 name = ConfigParser._clean_name(name_raw)
 
+            # SIP002 plugin: ?plugin=<name>;<opts>, e.g. obfs-local;obfs=http;obfs-host=example.com
+            query = ''
+            if '?' in clean_config:
+                clean_config, query = clean_config.split('?', 1)
+            clean_config = clean_config.rstrip('/')
+            plugin, _, plugin_opts = parse_qs(query).get('plugin', [''])[0].partition(';')
+
             address = ''
             port = ''
             decoded_info = ''
@@ -248,6 +299,7 @@ class ConfigParser:
                     decoded_info, server_part = full_decoded.rsplit('@', 1)
                     if ':' in server_part:
                         address, port = server_part.rsplit(':', 1)
+                        address = address.strip('[]')
                     else:
                         return None
                 else:
@@ -269,6 +321,8 @@ class ConfigParser:
                 'port': port,
                 'method': method,
                 'password': password,
+                'plugin': plugin.strip(),
+                'plugin_opts': plugin_opts.strip(),
                 'name': name,
                 'original': config
             }
@@ -307,12 +361,23 @@ class ConfigParser:
         try:
             parsed = urlparse(config)
             name = parsed.fragment if parsed.fragment else ''
+            params = parse_qs(parsed.query or '')
+            # hysteria2 puts the password in the user part, hysteria v1 in auth=
+            password = unquote(parsed.username or '')
+            if parsed.password:
+                password = f"{password}:{unquote(parsed.password)}"
             
             return {
                 'type': 'hysteria' if config.startswith('hysteria://') else 'hysteria2',
                 'address': parsed.hostname or '',
                 'port': str(parsed.port) if parsed.port else '',
                 'name': ConfigParser._clean_name(name),
+                'password': password or params.get('auth', [''])[0],
+                'sni': params.get('sni', [''])[0] or params.get('peer', [''])[0],
+                'insecure': params.get('insecure', ['0'])[0] in ('1', 'true'),
+                'obfs': params.get('obfs', [''])[0],
+                'obfsPassword': params.get('obfs-password', [''])[0],
+                'alpn': params.get('alpn', [''])[0],
                 'original': config
             }
         except Exception as e:
@@ -325,12 +390,19 @@ class ConfigParser:
         try:
             parsed = urlparse(config)
             name = parsed.fragment if parsed.fragment else ''
+            params = parse_qs(parsed.query or '')
             
             return {
                 'type': 'tuic',
                 'address': parsed.hostname or '',
                 'port': str(parsed.port) if parsed.port else '',
                 'name': ConfigParser._clean_name(name),
+                'id': unquote(parsed.username or ''),
+                'password': unquote(parsed.password or ''),
+                'sni': params.get('sni', [''])[0],
+                'alpn': params.get('alpn', [''])[0],
+                'congestion_control': params.get('congestion_control', [''])[0],
+                'insecure': params.get('allow_insecure', ['0'])[0] in ('1', 'true'),
                 'original': config
             }
         except Exception as e:
@@ -0,0 +1,310 @@
+"""
+Pipeline module: streaming collect -> parse -> resolve -> geolocate -> test
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+from .config import *
+from .fingerprint import link_fingerprint, link_order
+from .metrics import METRICS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+# Fields copied from a tested config to its untested duplicates
+_RESULT_FIELDS = ('tested', 'working', 'latency_ms', 'jitter_ms', 'loss', 'uptime', 'streak')
+
+
+class StreamingPipeline:
+    """Run the collect/parse/filter/test stages concurrently instead of one after another
+
+    Stages are threads connected by bounded queues, so a slow stage blocks
+    the one feeding it (backpressure) instead of letting work pile up in
+    memory. Configs move on as soon as their source has been extracted:
+    parsing and DNS run while slow channels are still downloading, and
+    geolocation and testing work in batches of `batch_size` (or whatever
+    arrived within `batch_wait` seconds). Test batches all feed one probe
+    run, so new probes start while earlier ones are still in flight.
+
+    With a `store`, recent configs of sources that failed to load are fed
+    in after collection like another source, and links with a fresh stored result skip parsing,
+    DNS and geolocation and go straight to testing.
+
+    The result matches the staged run: per-country lists sorted by link_id
+    and deduplicated, plus the working configs per tested country.
+    """
+
+    def __init__(self, collector, parser, config_filter, tester, scheduler,
+                 dead_set=None, store=None, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 batch_size: int = PIPELINE_BATCH_SIZE, batch_wait: float = PIPELINE_BATCH_WAIT,
+                 resolvers: int = MAX_WORKERS):
+        self.collector = collector
+        self.parser = parser
+        self.filter = config_filter
+        self.tester = tester
+        self.scheduler = scheduler
+        self.dead_set = dead_set
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.resolvers = max(1, resolvers)
+
+        self.links: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.parsed: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.resolved: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.located: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        self.categorized: Dict[str, list] = {}
+        # parse results of this run, and links that didn't parse, for the store
+        self.fresh: List[Dict] = []
+        self.unparsed: List[str] = []
+        self.stats = {'collected': 0, 'recent': 0, 'dead': 0, 'reused': 0, 'parsed': 0, 'located': 0, 'tested': 0}
+        self._stats_lock = threading.Lock()
+        self._categorized_lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _emit(self, country: str, config: Dict):
+        """Hand a located config to the test stage"""
+        with self._categorized_lock:
+            self.categorized.setdefault(country, []).append(config)
+        self._count('located')
+        self.located.put((country, config))
+
+    def _batches(self, source: queue.Queue, producers: int = 1) -> Iterator[list]:
+        """Yield batches from `source` until all `producers` have sent _DONE"""
+        batch: list = []
+        flush_at = 0.0
+        while producers:
+            timeout = max(flush_at - time.monotonic(), 0) if batch else None
+            try:
+                item = source.get(timeout=timeout)
+            except queue.Empty:
+                yield batch
+                batch = []
+                continue
+            if item is _DONE:
+                producers -= 1
+                continue
+            if not batch:
+                flush_at = time.monotonic() + self.batch_wait
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _timed(stage: str, target):
+        """Thread target that records how long the stage ran"""
+        def run():
+            with METRICS.timer("pipeline_stage_seconds", stage=stage):
+                target()
+        return run
+
+    def _collect_stage(self):
+        def forward(configs, source):
+            self._count('collected', len(configs))
+            self.links.put((configs, source))
+
+        self.collector.on_extracted = forward
+        try:
+            self.collector.collect_all()
+            if self.store is not None:
+                self._recall_stored()
+        except Exception as e:
+            logger.error(f"Pipeline collect stage failed: {e}", exc_info=True)
+        finally:
+            self.collector.on_extracted = None
+            self.links.put(_DONE)
+
+    def _recall_stored(self):
+        """Record what was collected and feed in recent configs of sources that failed to load"""
+        collected = self.collector.configs
+        self.store.mark_seen(collected, self.collector.sources)
+        recent = {link: source for link, source in self.store.recent_links(self.collector.failed_sources).items()
+                  if link not in collected}
+        if recent:
+            for link, source in recent.items():
+                self.collector.sources.setdefault(link, source)
+            self._count('recent', len(recent))
+            self.links.put((set(recent), ''))
+
+    def _parse_stage(self):
+        seen = set()
+        reused = set()
+        try:
+            while True:
+                item = self.links.get()
+                if item is _DONE:
+                    break
+                links, source = item
+                for link in links:
+                    if link in seen:
+                        continue
+                    seen.add(link)
+                    if self.dead_set is not None and link_fingerprint(link) in self.dead_set:
+                        self._count('dead')
+                        continue
+                    if self.store is not None:
+                        known, config = self.store.lookup(link)
+                        if known:
+                            if config is not None and config['link_id'] not in reused:
+                                reused.add(config['link_id'])
+                                self._count('reused')
+                                self._emit(config['country'], config)
+                            continue
+                    try:
+                        parsed = self.parser.parse_config(link)
+                    except Exception as e:
+                        logger.debug(f"Error parsing config: {e}")
+                        continue
+                    if parsed:
+                        parsed['source'] = self.collector.sources.get(link, source)
+                        self._count('parsed')
+                        self.fresh.append(parsed)
+                        self.parsed.put(parsed)
+                    else:
+                        self.unparsed.append(link)
+        except Exception as e:
+            logger.error(f"Pipeline parse stage failed: {e}", exc_info=True)
+        finally:
+            for _ in range(self.resolvers):
+                self.parsed.put(_DONE)
+
+    def _resolve_stage(self):
+        try:
+            while True:
+                config = self.parsed.get()
+                if config is _DONE:
+                    break
+                try:
+                    result = self.filter._resolve_config(config)
+                except Exception as e:
+                    logger.debug(f"Error processing config: {e}")
+                    continue
+                if result:
+                    self.resolved.put(result)
+        finally:
+            self.resolved.put(_DONE)
+
+    def _locate_stage(self):
+        batches = self._batches(self.resolved, producers=self.resolvers)
+        try:
+            for batch in batches:
+                METRICS.observe("pipeline_batch_size", len(batch), stage='locate')
+                for country, config in self.filter.locate(batch):
+                    self._emit(country, config)
+        except Exception as e:
+            logger.error(f"Pipeline locate stage failed: {e}", exc_info=True)
+            # keep draining (with the same generator, which knows how many resolvers
+            # are done) so resolvers blocked on a full queue can finish
+            for _ in batches:
+                pass
+        finally:
+            self.located.put(_DONE)
+
+    def _test_stage(self, batches: Iterator[list]):
+        """Test located configs as they arrive, on one probe run for the whole pipeline
+
+        The scheduler's probe and time budget and the per-country quota
+        apply to the run as a whole, not to each batch.
+        """
+        testable = lambda country: TEST_ALL_COUNTRIES or country in TEST_COUNTRIES
+        cap = self.scheduler.probe_cap()
+        if cap is not None:
+            budget = self.tester.probe_budget
+            self.tester.probe_budget = cap if budget is None else min(budget, cap)
+
+        representatives: Dict[str, Dict] = {}
+        duplicates: List[Tuple[Dict, Dict]] = []
+
+        def groups() -> Iterator[Dict[str, list]]:
+            for batch in batches:
+                METRICS.observe("pipeline_batch_size", len(batch), stage='test')
+                grouped: Dict[str, list] = {}
+                for country, config in batch:
+                    if not testable(country):
+                        continue
+                    # Duplicates are tested once and share the result
+                    key = f"{country}|{self.filter.duplicate_key(config)}"
+                    if key in representatives:
+                        duplicates.append((config, representatives[key]))
+                        continue
+                    representatives[key] = config
+                    grouped.setdefault(country, []).append(config)
+                if grouped:
+                    self._count('tested', sum(len(configs) for configs in grouped.values()))
+                    yield grouped
+
+        self.tester.test_stream(groups(), weights=self.scheduler.weights,
+                                order_by=self.scheduler.country_order,
+                                time_budget=self.scheduler.time_budget)
+
+        for config, representative in duplicates:
+            for field in _RESULT_FIELDS:
+                if field in representative:
+                    config[field] = representative[field]
+
+    def run(self) -> Tuple[Dict[str, list], Dict[str, list]]:
+        """Run all stages and return (categorized, tested) like the staged main()"""
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=self._timed('collect', self._collect_stage), name="pipeline-collect", daemon=True),
+            threading.Thread(target=self._timed('parse', self._parse_stage), name="pipeline-parse", daemon=True),
+            threading.Thread(target=self._timed('locate', self._locate_stage), name="pipeline-locate", daemon=True),
+        ]
+        threads += [threading.Thread(target=self._timed('resolve', self._resolve_stage),
+                                     name=f"pipeline-resolve-{i}", daemon=True)
+                    for i in range(self.resolvers)]
+        for thread in threads:
+            thread.start()
+
+        located = self._batches(self.located)
+        try:
+            with METRICS.timer("pipeline_stage_seconds", stage='test'):
+                self._test_stage(located)
+        except Exception as e:
+            logger.error(f"Pipeline test stage failed: {e}", exc_info=True)
+            # keep draining so upstream stages blocked on a full queue can finish; a
+            # fresh generator would wait for a _DONE the test stage may already have taken
+            for _ in located:
+                pass
+        finally:
+            for thread in threads:
+                thread.join()
+
+        categorized = {}
+        tested = {}
+        for country in sorted(self.categorized):
+            configs = sorted(self.categorized[country], key=link_order)
+            configs = self.filter.remove_duplicates(configs)
+            categorized[country] = configs
+            working = [config for config in configs if config.get('working')]
+            if working:
+                tested[country] = working
+
+        # collection has finished, so every link has its final source now
+        for config in self.fresh:
+            config['source'] = self.collector.sources.get(config.get('original', ''), config.get('source', ''))
+
+        if self.store is not None:
+            self.store.save_located(self.fresh, self.unparsed)
+
+        for stage, key in (('collected', 'collected'), ('known_dead', 'dead'), ('parsed', 'parsed'),
+                           ('stored', 'reused')):
+            METRICS.incr("configs_total", self.stats[key], stage=stage)
+        logger.info(f"Pipeline finished in {time.monotonic() - start:.1f}s: {self.stats['collected']} collected, "
+                    f"{self.stats['recent']} recalled from the store, {self.stats['dead']} known-dead, "
+                    f"{self.stats['reused']} reused, {self.stats['parsed']} parsed, "
+                    f"{self.stats['located']} located, {self.stats['tested']} sent to testing")
+        return categorized, tested
@@ -0,0 +1,307 @@
+"""
+Probe module: asyncio engine for running thousands of network probes at once
+"""
+
+import asyncio
+import logging
+import os
+import ssl
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+from .config import PROBE_CONCURRENCY, PROBE_PER_IP_LIMIT
+from .metrics import METRICS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def raise_fd_limit(wanted: int) -> int:
+    """Raise the soft open-files limit towards `wanted`; returns the usable limit"""
+    if resource is None:
+        return wanted
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        if soft != resource.RLIM_INFINITY and soft < target:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        return soft if soft != resource.RLIM_INFINITY else wanted
+    except Exception as e:
+        logger.debug(f"Could not raise open-files limit: {e}")
+        return wanted
+
+
+# A probe job: (key, target ip, timeout, zero-argument coroutine factory)
+ProbeJob = Tuple[Hashable, str, float, Callable[[], Awaitable]]
+
+
+class ProbeEngine:
+    """Run probes with a global concurrency limit and a per-target-IP limit
+
+    Each probe gets its own deadline, which starts once it holds both limits,
+    so queueing time never eats into a probe's timeout. Wall time for N probes
+    is bounded by roughly timeout * ceil(N / concurrency).
+    """
+
+    def __init__(self, concurrency: int = PROBE_CONCURRENCY,
+                 per_ip_limit: int = PROBE_PER_IP_LIMIT):
+        # keep some descriptors free for DNS, logging and the event loop itself
+        usable = raise_fd_limit(concurrency + 256) - 128
+        self.concurrency = max(1, min(concurrency, usable))
+        self.per_ip_limit = max(1, per_ip_limit)
+        if self.concurrency < concurrency:
+            logger.warning(f"Probe concurrency capped at {self.concurrency} by the open-files limit")
+
+    def run(self, jobs: List[ProbeJob], time_budget: Optional[float] = None,
+            on_result: Optional[Callable[[Hashable, object], Iterable[Hashable]]] = None
+            ) -> Dict[Hashable, object]:
+        """Run all jobs and return {key: result}; failed or timed-out probes map to None
+
+        Jobs start in list order. With `time_budget` (seconds), probes still
+        queued or running when it runs out are cancelled and left out of the
+        result. `on_result(key, result)` is called as each probe finishes and
+        may return keys of other jobs to cancel (also left out of the result).
+        """
+        if not jobs:
+            return {}
+        return self.run_stream(iter([jobs]), time_budget, on_result)
+
+    def run_stream(self, feed: Iterator[List[ProbeJob]], time_budget: Optional[float] = None,
+                   on_result: Optional[Callable[[Hashable, object], Iterable[Hashable]]] = None
+                   ) -> Dict[Hashable, object]:
+        """Like run(), but jobs come in lists from `feed` while earlier ones are probing
+
+        `feed` may block; it is read on a worker thread so one event loop and
+        one set of limits serve the whole run. The time budget starts with the
+        first job; once it is spent, later jobs are dropped but `feed` is
+        still read to the end. A key that was already submitted is skipped.
+        """
+        return asyncio.run(self.run_async(feed, time_budget, on_result))
+
+    async def run_async(self, feed: Iterator[List[ProbeJob]], time_budget: Optional[float] = None,
+                        on_result: Optional[Callable[[Hashable, object], Iterable[Hashable]]] = None
+                        ) -> Dict[Hashable, object]:
+        loop = asyncio.get_running_loop()
+        global_limit = asyncio.Semaphore(self.concurrency)
+        ip_limits: Dict[str, asyncio.Semaphore] = {}
+        results: Dict[Hashable, object] = {}
+        tasks: Dict[Hashable, asyncio.Task] = {}
+        timer = None
+        expired = False
+        dropped = 0
+
+        async def guarded(key, ip, timeout, factory):
+            ip_limit = ip_limits.setdefault(ip, asyncio.Semaphore(self.per_ip_limit))
+            async with ip_limit:
+                async with global_limit:
+                    start = time.perf_counter()
+                    outcome = 'done'
+                    try:
+                        result = await asyncio.wait_for(factory(), timeout)
+                    except asyncio.TimeoutError:
+                        result, outcome = None, 'timeout'
+                    except OSError:
+                        result, outcome = None, 'oserror'
+                    except Exception as e:
+                        logger.debug(f"Probe {key} failed: {e}")
+                        result, outcome = None, 'error'
+                    METRICS.record_time("probe_seconds", time.perf_counter() - start, outcome=outcome)
+            results[key] = result
+
+            if on_result is not None:
+                for other in on_result(key, result) or ():
+                    task = tasks.get(other)
+                    if task is not None and other != key and not task.done():
+                        task.cancel()
+
+        def expire():
+            nonlocal expired
+            expired = True
+            pending = [task for task in tasks.values() if not task.done()]
+            if pending:
+                logger.warning(f"Probe time budget exhausted, cancelling {len(pending)} probes")
+                for task in pending:
+                    task.cancel()
+
+        try:
+            while True:
+                jobs = await loop.run_in_executor(None, next, feed, None)
+                if jobs is None:
+                    break
+                if expired:
+                    dropped += len(jobs)
+                    continue
+                if jobs and timer is None and time_budget is not None:
+                    timer = loop.call_later(time_budget, expire)
+                for job in jobs:
+                    if job[0] not in tasks:
+                        tasks[job[0]] = asyncio.ensure_future(guarded(*job))
+
+            if tasks:
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+        if dropped:
+            logger.warning(f"Probe time budget exhausted, dropped {dropped} probes that arrived later")
+        cancelled = sum(1 for task in tasks.values() if task.cancelled())
+        METRICS.incr("probes_cancelled_total", cancelled)
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} probes")
+        return results
+
+
+async def tcp_connect(ip: str, port: int) -> Optional[float]:
+    """Open a TCP connection and return the connect time in seconds"""
+    start = time.perf_counter()
+    _, writer = await asyncio.open_connection(ip, port)
+    rtt = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return rtt
+
+
+_TLS_CONTEXTS: Dict[Tuple[str, ...], ssl.SSLContext] = {}
+
+
+def _client_tls_context(alpn: Optional[List[str]] = None) -> ssl.SSLContext:
+    """Shared client context per ALPN list
+
+    Proxy certs are often self-signed and REALITY presents the cover site's
+    certificate, so only the handshake itself is checked, not the chain.
+    No CA store is loaded (create_default_context() would read it on every
+    call, ~30 ms of blocking work on the event loop per probe).
+    """
+    key = tuple(alpn or ())
+    context = _TLS_CONTEXTS.get(key)
+    if context is None:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        if alpn:
+            context.set_alpn_protocols(alpn)
+        _TLS_CONTEXTS[key] = context
+    return context
+
+
+async def tls_handshake(ip: str, port: int, server_name: Optional[str] = None,
+                        alpn: Optional[List[str]] = None) -> Optional[float]:
+    """Connect, complete a TLS handshake (ClientHello with SNI/ALPN) and return the elapsed seconds"""
+    start = time.perf_counter()
+    _, writer = await asyncio.open_connection(
+        ip, port,
+        ssl=_client_tls_context(alpn),
+        server_hostname=server_name or '',
+    )
+    rtt = time.perf_counter() - start
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return rtt
+
+
+# Reserved "greasing" version (RFC 9000, 15): any QUIC server must answer an
+# Initial-sized packet carrying it with a Version Negotiation packet.
+QUIC_PROBE_VERSION = b'\x1a\x2a\x3a\x4a'
+
+
+def quic_probe_packet() -> bytes:
+    """Build a 1200-byte long-header packet that triggers Version Negotiation"""
+    dcid = os.urandom(8)
+    scid = os.urandom(8)
+    header = bytes([0xC0 | (os.urandom(1)[0] & 0x0F)]) + QUIC_PROBE_VERSION
+    header += bytes([len(dcid)]) + dcid + bytes([len(scid)]) + scid
+    return header + b'\x00' * (1200 - len(header))
+
+
+class _UDPProbeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, reply: asyncio.Future):
+        self.reply = reply
+
+    def datagram_received(self, data, addr):
+        if not self.reply.done():
+            self.reply.set_result(data)
+
+    def error_received(self, exc):
+        # ICMP port/host unreachable surfaces here as ConnectionRefusedError
+        if not self.reply.done():
+            self.reply.set_exception(exc)
+
+
+async def udp_probe(ip: str, port: int, payload: Optional[bytes] = None) -> Optional[float]:
+    """Send a QUIC probe datagram and return the time until any reply arrives
+
+    ICMP unreachable fails the probe immediately instead of waiting for the
+    deadline; silence is left to the caller's timeout.
+    """
+    loop = asyncio.get_running_loop()
+    reply = loop.create_future()
+    start = time.perf_counter()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _UDPProbeProtocol(reply), remote_addr=(ip, port))
+    try:
+        transport.sendto(payload if payload is not None else quic_probe_packet())
+        await reply
+        return time.perf_counter() - start
+    finally:
+        transport.close()
+
+
+def summarize_samples(rtts: List[Optional[float]]) -> Dict:
+    """Summarize connect samples (seconds, None = failed) as median/jitter/loss"""
+    ok = [rtt * 1000 for rtt in rtts if rtt is not None]
+    summary = {
+        'latency_ms': None,
+        'jitter_ms': None,
+        'loss': round(1 - len(ok) / len(rtts), 3) if rtts else 1.0,
+        'samples': len(rtts),
+    }
+    if ok:
+        summary['latency_ms'] = round(statistics.median(ok), 1)
+        diffs = [abs(b - a) for a, b in zip(ok, ok[1:])]
+        summary['jitter_ms'] = round(sum(diffs) / len(diffs), 1) if diffs else 0.0
+    return summary
+
+
+async def sample_endpoint(probe: Callable[[], Awaitable], samples: int, timeout: float,
+                          max_loss: float) -> Dict:
+    """Run `probe` up to `samples` times, each with its own deadline
+
+    Sampling stops early once the loss can no longer end up at or below
+    `max_loss`, so dead endpoints don't pay for every sample. It also stops
+    at the first timeout: that is an unreachable endpoint rather than
+    packet loss, and a second full timeout would double the endpoint's
+    worst case against the probe budget.
+    """
+    rtts: List[Optional[float]] = []
+    allowed_failures = int(max_loss * samples)
+
+    for _ in range(samples):
+        try:
+            rtts.append(await asyncio.wait_for(probe(), timeout))
+        except asyncio.TimeoutError:
+            rtts.append(None)
+            break
+        except OSError:
+            rtts.append(None)
+        except Exception as e:
+            logger.debug(f"Probe sample failed: {e}")
+            rtts.append(None)
+        if rtts.count(None) > allowed_failures:
+            break
+
+    summary = summarize_samples(rtts)
+    summary['working'] = summary['latency_ms'] is not None and rtts.count(None) <= allowed_failures
+    return summary
@@ -0,0 +1,68 @@
+"""
+Rebuild cache module: remembers renamed links between runs
+"""
+
+import json
+import logging
+import os
+from typing import Dict, Iterable
+from .config import REBUILD_CACHE_FILE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump whenever config naming or link rebuilding changes, so stale links are dropped
+REBUILD_FORMAT_VERSION = 2
+
+
+class RebuildCache:
+    """[rebuilt link, name] pairs keyed by link_id, then by "country|index|cdn"
+
+    Only entries used in the latest run are saved, so the cache tracks the
+    current config set instead of growing forever.
+    """
+
+    def __init__(self, path: str = REBUILD_CACHE_FILE):
+        self.path = path
+        self.entries: Dict[str, Dict[str, list]] = {}
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != REBUILD_FORMAT_VERSION:
+                logger.info("Rebuild cache is from another naming format, starting fresh")
+                return
+            self.entries = data.get('links', {})
+            logger.info(f"Loaded rebuild cache for {len(self.entries)} links")
+        except Exception as e:
+            logger.warning(f"Could not load rebuild cache {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': REBUILD_FORMAT_VERSION, 'links': self.entries}, f,
+                          ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save rebuild cache {self.path}: {e}")
+
+    def subset(self, link_ids: Iterable[str]) -> Dict[str, Dict[str, list]]:
+        """The part of the cache a worker needs for these links"""
+        return {link_id: self.entries[link_id] for link_id in link_ids if link_id in self.entries}
+
+    def replace(self, used: Iterable[Dict[str, Dict[str, list]]]):
+        """Keep exactly the entries the workers used or created this run"""
+        entries: Dict[str, Dict[str, list]] = {}
+        for part in used:
+            for link_id, links in part.items():
+                entries.setdefault(link_id, {}).update(links)
+        self.entries = entries
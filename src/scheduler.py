@@ -0,0 +1,88 @@
+"""
+Scheduler module for spreading the test budget across countries
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional
+from .config import *
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def allocate_budget(demands: Dict, weights: Dict, total: int, order: List) -> Dict:
+    """Split `total` probes between groups proportionally to their weights
+
+    A group never gets more than it demands; whatever it leaves over is
+    shared again between the groups that still want more. `order` decides
+    who gets the remainder when shares round down.
+    """
+    allocation = {group: 0 for group in demands}
+    left = max(total, 0)
+
+    while left > 0:
+        active = [group for group in order if allocation.get(group, 0) < demands.get(group, 0)]
+        if not active:
+            break
+
+        weight_sum = sum(weights.get(group, DEFAULT_COUNTRY_TEST_WEIGHT) for group in active)
+        round_total = left
+        for group in active:
+            weight = weights.get(group, DEFAULT_COUNTRY_TEST_WEIGHT)
+            share = max(1, int(round_total * weight / weight_sum))
+            give = min(share, demands[group] - allocation[group], left)
+            allocation[group] += give
+            left -= give
+            if left == 0:
+                break
+
+    return allocation
+
+
+class TestScheduler:
+    """Test every categorized country within a global probe and time budget"""
+
+    def __init__(self, tester, time_budget: Optional[float] = TEST_TIME_BUDGET_SECONDS,
+                 weights: Optional[Dict[str, float]] = None):
+        self.tester = tester
+        self.time_budget = time_budget
+        self.weights = weights if weights is not None else COUNTRY_TEST_WEIGHTS
+
+    def country_order(self, countries: List[str]) -> List[str]:
+        """PRIORITY_COUNTRY first, then by weight, then alphabetically"""
+        return sorted(countries, key=lambda c: (
+            c != PRIORITY_COUNTRY,
+            -self.weights.get(c, DEFAULT_COUNTRY_TEST_WEIGHT),
+            c,
+        ))
+
+    def probe_cap(self) -> Optional[int]:
+        """Most probes that fit the time budget at the tester's concurrency"""
+        if not self.time_budget:
+            return None
+        worst_case = max(self.tester.timeout, self.tester.udp_timeout) * self.tester.samples
+        return int(self.tester.engine.concurrency * self.time_budget / max(worst_case, 0.001))
+
+    def run(self, categorized: Dict[str, list]) -> Dict[str, list]:
+        """Test all countries and return {country: working configs} for those with any"""
+        countries = [c for c in categorized if TEST_ALL_COUNTRIES or c in TEST_COUNTRIES]
+        order = self.country_order(countries)
+
+        cap = self.probe_cap()
+        if cap is not None:
+            budget = self.tester.probe_budget
+            self.tester.probe_budget = cap if budget is None else min(budget, cap)
+
+        logger.info(f"Testing {len(order)} countries (probe budget: {self.tester.probe_budget})")
+
+        start = time.monotonic()
+        working = self.tester.test_groups(
+            {country: categorized[country] for country in order},
+            weights=self.weights,
+            order=order,
+            time_budget=self.time_budget,
+        )
+        logger.info(f"Testing took {time.monotonic() - start:.1f}s")
+
+        return {country: configs for country, configs in working.items() if configs}
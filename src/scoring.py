@@ -0,0 +1,109 @@
+"""
+Scoring module for ranking configs by expected quality
+"""
+
+import logging
+from typing import Dict, List, Optional
+from .config import *
+from .fingerprint import link_order
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class QualityScorer:
+    """Score configs from latency, uptime history, source reliability and protocol
+
+    Each component is normalised to 0..1 and combined with SCORE_WEIGHTS;
+    components without data (e.g. untested configs) fall back to a neutral
+    value so they neither win nor lose on that component.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        self.weights = weights if weights is not None else SCORE_WEIGHTS
+        self.source_reliability: Dict[str, float] = {}
+
+    def learn_sources(self, categorized: Dict[str, List[Dict]]):
+        """Estimate each source's reliability from this run's test results
+
+        Uses (working + 1) / (tested + 2) so sources with few tested configs
+        stay close to the neutral 0.5.
+        """
+        tested: Dict[str, int] = {}
+        working: Dict[str, int] = {}
+
+        for configs in categorized.values():
+            for config in configs:
+                source = config.get('source')
+                if not source or not config.get('tested'):
+                    continue
+                tested[source] = tested.get(source, 0) + 1
+                working[source] = working.get(source, 0) + int(bool(config.get('working')))
+
+        self.source_reliability = {
+            source: (working.get(source, 0) + 1) / (count + 2)
+            for source, count in tested.items()
+        }
+
+    def _latency_component(self, config: Dict) -> float:
+        latency = config.get('latency_ms')
+        if latency is None:
+            return 0.5 if not config.get('tested') else 0.0
+        return 1.0 / (1.0 + latency / SCORE_LATENCY_REF_MS)
+
+    def _uptime_component(self, config: Dict) -> float:
+        uptime = config.get('uptime')
+        if uptime is None:
+            return 0.5
+        return uptime
+
+    def _source_component(self, config: Dict) -> float:
+        return self.source_reliability.get(config.get('source', ''), 0.5)
+
+    def _protocol_component(self, config: Dict) -> float:
+        protocol = PROTOCOL_SCORES.get(str(config.get('type', '')).lower(), 0.5)
+        security = str(config.get('security', '') or '').lower()
+        return protocol * SECURITY_SCORES.get(security, SECURITY_SCORES.get('', 1.0))
+
+    def score(self, config: Dict) -> float:
+        """Score a config between 0 and 1 (higher is better)"""
+        components = {
+            'latency': self._latency_component(config),
+            'uptime': self._uptime_component(config),
+            'source': self._source_component(config),
+            'protocol': self._protocol_component(config),
+        }
+        total_weight = sum(self.weights.get(name, 0) for name in components) or 1.0
+        score = sum(value * self.weights.get(name, 0) for name, value in components.items())
+        score /= total_weight
+
+        loss = config.get('loss')
+        if loss:
+            score *= 1.0 - loss
+
+        return round(score, 4)
+
+    def rank(self, configs: List[Dict], top_n: Optional[int] = None) -> List[Dict]:
+        """Sort configs best first, optionally keeping the top N
+
+        Scores are compared in SCORE_ORDER_BUCKET steps; within a step the
+        faster config goes first (latency in SCORE_ORDER_LATENCY_MS steps,
+        untested last) and the fingerprint breaks the remaining ties, so small
+        run-to-run latency noise doesn't reshuffle the output.
+        """
+        for config in configs:
+            config['score'] = self.score(config)
+
+        def key(config):
+            bucket = int(config['score'] / SCORE_ORDER_BUCKET) if SCORE_ORDER_BUCKET else config['score']
+            latency = config.get('latency_ms')
+            if latency is None:
+                speed = float('inf')
+            else:
+                speed = int(latency / SCORE_ORDER_LATENCY_MS) if SCORE_ORDER_LATENCY_MS else latency
+            return (-bucket, speed) + link_order(config)
+
+        ranked = sorted(configs, key=key)
+        if top_n is not None:
+            ranked = ranked[:top_n]
+        return ranked
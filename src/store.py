@@ -0,0 +1,221 @@
+"""
+Store module: SQLite store of every known config, so runs only parse and geolocate what changed
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from .config import STORE_FILE, STORE_GEO_TTL_HOURS, STORE_MAX_AGE_HOURS, STORE_RETRY_HOURS
+from .fingerprint import link_fingerprint, link_order
+from .metrics import METRICS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the parser or filter changes the fields they produce, so stored configs are re-parsed
+STORE_FORMAT_VERSION = 2
+
+# Per-run fields that are not part of a config's parse/geo result
+_RUN_FIELDS = ('source', 'tested', 'working', 'latency_ms', 'jitter_ms', 'loss', 'uptime', 'streak',
+               'score', 'rebuilt', 'rebuilt_name')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS configs (
+    link_id TEXT PRIMARY KEY,
+    link TEXT NOT NULL,
+    source TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    located_at REAL,
+    country TEXT,
+    parsed TEXT
+);
+CREATE INDEX IF NOT EXISTS configs_last_seen ON configs (last_seen);
+"""
+
+
+class ConfigStore:
+    """Every config seen in the last STORE_MAX_AGE_HOURS, keyed by link_id
+
+    A row keeps the link, where and when it was seen (first_seen/last_seen),
+    and the parse + geolocation result (`parsed`, with ip/country/cdn) from
+    when it was last located. Links that could not be parsed, resolved or
+    located are kept with an empty result and retried after
+    STORE_RETRY_HOURS; located ones are re-resolved after STORE_GEO_TTL_HOURS.
+
+    Test results stay in TestHistory, which is keyed by endpoint and
+    already decides what needs probing.
+    """
+
+    def __init__(self, path: str = STORE_FILE, geo_ttl_hours: float = STORE_GEO_TTL_HOURS,
+                 retry_hours: float = STORE_RETRY_HOURS):
+        self.path = path
+        self.geo_ttl = geo_ttl_hours * 3600
+        self.retry = retry_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.db = self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            db = self._connect()
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Config store {self.path} is unreadable ({e}), starting fresh")
+            os.remove(self.path)
+            db = self._connect()
+
+        row = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != str(STORE_FORMAT_VERSION):
+            if row is not None:
+                logger.info("Config store is from another parser version, re-parsing stored configs")
+            db.execute("UPDATE configs SET located_at = NULL, country = NULL, parsed = NULL")
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(STORE_FORMAT_VERSION),))
+            db.commit()
+
+        count = db.execute("SELECT COUNT(*) FROM configs").fetchone()[0]
+        logger.info(f"Opened config store with {count} configs")
+        return db
+
+    def _connect(self) -> sqlite3.Connection:
+        # the workflow caches the file on its own, so no WAL side files
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode = DELETE")
+        db.execute("PRAGMA synchronous = NORMAL")
+        db.executescript(_SCHEMA)
+        return db
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def mark_seen(self, links: Iterable[str], sources: Dict[str, str], now: Optional[float] = None):
+        """Record that these links were collected in this run"""
+        now = now or time.time()
+        # sorted, so the link and source kept for reposts sharing a link_id don't depend on set order
+        rows = [(link_fingerprint(link), link, sources.get(link, ''), now, now) for link in sorted(links)]
+        with self._lock:
+            self.db.executemany(
+                "INSERT INTO configs (link_id, link, source, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (link_id) DO UPDATE SET last_seen = excluded.last_seen",
+                rows)
+            self.db.commit()
+
+    def recent_links(self, sources: Optional[Iterable[str]] = None, max_age_hours: float = STORE_MAX_AGE_HOURS,
+                     now: Optional[float] = None) -> Dict[str, str]:
+        """{link: source} of every config seen in the last `max_age_hours`, only from `sources` if given"""
+        cutoff = (now or time.time()) - max_age_hours * 3600
+        with self._lock:
+            rows = self.db.execute("SELECT link, source FROM configs WHERE last_seen >= ?", (cutoff,)).fetchall()
+        if sources is not None:
+            sources = set(sources)
+            rows = [(link, source) for link, source in rows if source in sources]
+        return dict(rows)
+
+    def _lookup(self, link_id: str, now: float) -> Tuple[bool, Optional[Dict]]:
+        row = self.db.execute("SELECT located_at, country, parsed, source FROM configs WHERE link_id = ?",
+                              (link_id,)).fetchone()
+        if row is None or row[0] is None:
+            return False, None
+        located_at, country, parsed, source = row
+        ttl = self.geo_ttl if country else self.retry
+        if now - located_at > ttl:
+            return False, None
+        if not country or not parsed:
+            return True, None
+        config = json.loads(parsed)
+        config['source'] = source or ''
+        return True, config
+
+    def lookup(self, link: str, now: Optional[float] = None) -> Tuple[bool, Optional[Dict]]:
+        """(known, config) for a link: known is False when it must be parsed and located again
+
+        A known link comes back as its stored config (with ip/country/cdn set), or
+        None when it was found unusable recently.
+        """
+        with self._lock:
+            known, config = self._lookup(link_fingerprint(link), now or time.time())
+        if known:
+            self.hits += 1
+        else:
+            self.misses += 1
+        METRICS.incr("store_lookups_total", outcome='miss' if not known else 'hit' if config else 'unusable')
+        return known, config
+
+    def split(self, links: Iterable[str], now: Optional[float] = None) -> Tuple[List[Dict], List[str]]:
+        """Split links into (stored configs still fresh, links that need parsing and locating)
+
+        Known-unusable links are dropped, and a stored config comes back once
+        even when several links (e.g. reposts under other names) share its link_id.
+        """
+        now = now or time.time()
+        cached: List[Dict] = []
+        fresh: List[str] = []
+        known_ids: Dict[str, bool] = {}
+        for link in sorted(links):
+            link_id = link_fingerprint(link)
+            if link_id not in known_ids:
+                known, config = self.lookup(link, now)
+                known_ids[link_id] = known
+                if known and config is not None:
+                    cached.append(config)
+            if not known_ids[link_id]:
+                fresh.append(link)
+        return cached, fresh
+
+    def save_located(self, configs: Iterable[Dict], unparsed: Iterable[str] = (),
+                     now: Optional[float] = None):
+        """Store parse + geo results: configs with a country are kept, the rest remembered as unusable
+
+        Of reposts sharing a link_id, the located one that sorts first by
+        link is stored, the same one deduplication keeps in the outputs.
+        """
+        now = now or time.time()
+        chosen: Dict[str, Dict] = {}
+        for config in sorted(configs, key=lambda c: (not c.get('country'),) + link_order(c)):
+            link_id = config.get('link_id')
+            if link_id and link_id not in chosen:
+                chosen[link_id] = config
+
+        rows = []
+        for link_id, config in chosen.items():
+            country = config.get('country')
+            parsed = None
+            if country:
+                parsed = json.dumps({k: v for k, v in config.items() if k not in _RUN_FIELDS},
+                                    ensure_ascii=False, separators=(',', ':'))
+            rows.append((now, country, parsed, link_id))
+        for link in unparsed:
+            link_id = link_fingerprint(link)
+            if link_id not in chosen:
+                rows.append((now, None, None, link_id))
+
+        with self._lock:
+            self.db.executemany("UPDATE configs SET located_at = ?, country = ?, parsed = ? WHERE link_id = ?",
+                                rows)
+            self.db.commit()
+
+    def prune(self, max_age_hours: float = STORE_MAX_AGE_HOURS, now: Optional[float] = None) -> int:
+        """Forget configs not seen for `max_age_hours`; returns how many were removed"""
+        cutoff = (now or time.time()) - max_age_hours * 3600
+        with self._lock:
+            removed = self.db.execute("DELETE FROM configs WHERE last_seen < ?", (cutoff,)).rowcount
+            self.db.commit()
+            total = self.db.execute("SELECT COUNT(*) FROM configs").fetchone()[0]
+            if removed and removed > total // 4:
+                # give the space back, the file is saved to the Actions cache every run
+                self.db.execute("VACUUM")
+        if removed:
+            logger.info(f"Pruned {removed} configs not seen for {max_age_hours}h from the store")
+        return removed
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        return f"{self.hits}/{total} configs reused from the store"
@@ -2,73 +2,324 @@
 Tester module for testing proxy connections
 """
 
-import socket
+import ipaddress
 import logging
-from typing import Dict, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from .config import CONNECTION_TIMEOUT, MAX_WORKERS
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+from .config import (CONNECTION_TIMEOUT, PROBE_BUDGET_PER_RUN, PROBE_CONCURRENCY, PROBE_PER_IP_LIMIT,
+                     PROBE_SAMPLES, PROBE_MAX_LOSS, PROBE_MODE, UDP_PROBE_TIMEOUT,
+                     TEST_QUOTA_PER_COUNTRY)
+from .history import TestHistory
+from .metrics import METRICS
+from .scheduler import allocate_budget
+from .probe import ProbeEngine, sample_endpoint, tcp_connect, tls_handshake, udp_probe
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+UDP_PROTOCOLS = ('hysteria', 'hysteria2', 'tuic')
+
 
 class ConnectionTester:
     """Test proxy connections"""
-    
-    def __init__(self):
+
+    def __init__(self, concurrency: int = PROBE_CONCURRENCY,
+                 per_ip_limit: int = PROBE_PER_IP_LIMIT,
+                 history: Optional[TestHistory] = None,
+                 probe_budget: Optional[int] = PROBE_BUDGET_PER_RUN):
         self.timeout = CONNECTION_TIMEOUT
-    
+        self.udp_timeout = UDP_PROBE_TIMEOUT
+        self.samples = max(1, PROBE_SAMPLES)
+        self.max_loss = PROBE_MAX_LOSS
+        self.mode = PROBE_MODE
+        self.engine = ProbeEngine(concurrency, per_ip_limit)
+        self.history = history
+        # endpoints this tester may still probe in this run (None = unlimited)
+        self.probe_budget = probe_budget
+        # stop probing a group once it has this many working configs (None = off)
+        self.quota = TEST_QUOTA_PER_COUNTRY
+
     def test_configs(self, configs: list) -> list:
         """Test multiple configs and return working ones"""
-        logger.info(f"Testing {len(configs)} configs...")
-        
-        working_configs = []
-        
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {
-                executor.submit(self._test_single_config, config): config 
-                for config in configs
-            }
-            
-            for future in as_completed(futures):
-                try:
-                    result = future.result()
-                    if result:
-                        working_configs.append(result)
-                except Exception as e:
-                    logger.debug(f"Test failed: {e}")
+        return self.test_groups({None: configs}).get(None, [])
+
+    def test_groups(self, groups: Dict, weights: Optional[Dict] = None,
+                    order: Optional[List] = None,
+                    time_budget: Optional[float] = None) -> Dict:
+        """Test several groups of configs (e.g. countries) in one probe run
+
+        The run's probe budget is split between groups by `weights` (default
+        1 each, surplus flows to groups that still have due endpoints), with
+        `order` breaking ties. Within a group, endpoints most likely to work
+        go first; in quota mode a group's remaining probes are cancelled as
+        soon as it has `self.quota` working configs. Returns {group: working configs}.
+        """
+        return self.test_stream(iter([groups]), weights, lambda names: order or [], time_budget)
+
+    def test_stream(self, batches: Iterator[Dict], weights: Optional[Dict] = None,
+                    order_by: Optional[Callable[[List], List]] = None,
+                    time_budget: Optional[float] = None) -> Dict:
+        """Test groups of configs as they arrive, on one event loop for the whole run
+
+        `batches` yields {group: configs} and may block. Each batch is planned
+        like test_groups (with `order_by(groups)` breaking ties) and its probes
+        start right away next to those still running. Quota counts are kept
+        for the whole run, so a group that met its quota gets no more probes.
+        Returns {group: working configs} over all batches.
+        """
+        lock = threading.Lock()
+        arrived: Dict = {}   # group -> configs in arrival order
+        grouped: Dict = {}   # group -> {endpoint: configs}
+        owner: Dict = {}     # endpoint -> group whose quota it counts toward
+        working_endpoints = set()
+        pending: Dict = {}   # group -> endpoints still probing
+        found: Dict = {}     # group -> working configs so far, cached ones included
+        full = set()
+        selected: list = []
+        spent = 0
+
+        def plan(groups: Dict) -> list:
+            nonlocal spent
+            total = sum(len(configs) for configs in groups.values())
+            logger.info(f"Testing {total} configs in {len(groups)} groups...")
+
+            with lock:
+                due = {}
+                for group, configs in groups.items():
+                    arrived.setdefault(group, []).extend(configs)
+                    found.setdefault(group, 0)
+                    known = grouped.setdefault(group, {})
+                    new = {}
+                    for endpoint, members in self._group_by_endpoint(configs).items():
+                        if endpoint in known:
+                            known[endpoint].extend(members)
+                            if endpoint in working_endpoints and owner.get(endpoint) == group:
+                                found[group] += len(members)
+                        else:
+                            known[endpoint] = new[endpoint] = members
+                    due[group] = self._due_endpoints(list(new))
+                    if self.quota is not None:
+                        # endpoints that aren't due keep their last result, so they count toward the quota
+                        for endpoint in self._cached_working(new, due[group]):
+                            working_endpoints.add(endpoint)
+                            owner.setdefault(endpoint, group)
+                            found[group] += len(new[endpoint])
+
+                ordered = [group for group in (order_by(list(groups)) if order_by else []) if group in groups]
+                ordered += [group for group in groups if group not in ordered]
+
+                if self.probe_budget is None:
+                    allowance = {group: len(endpoints) for group, endpoints in due.items()}
+                else:
+                    allowance = allocate_budget({group: len(endpoints) for group, endpoints in due.items()},
+                                                weights or {}, max(self.probe_budget - spent, 0), ordered)
+
+                # Interleave groups rank by rank so every group's best candidates start early
+                queues = {group: due[group][:allowance.get(group, 0)] for group in ordered}
+                if self.quota is not None:
+                    for group in ordered:
+                        if found[group] >= self.quota:
+                            if group not in full:
+                                logger.info(f"Quota of {self.quota} working configs already met for {group}")
+                                full.add(group)
+                            queues[group] = []
+                            continue
+                        queues[group].sort(key=lambda endpoint: -self._prior_score(endpoint))
+
+                jobs = []
+                for rank in range(max((len(q) for q in queues.values()), default=0)):
+                    for group in ordered:
+                        if rank < len(queues[group]):
+                            endpoint = queues[group][rank]
+                            if endpoint in owner:
+                                continue
+                            owner[endpoint] = group
+                            job = self._build_job(endpoint)
+                            if job:
+                                selected.append(endpoint)
+                                pending.setdefault(group, set()).add(endpoint)
+                                jobs.append(job)
+                spent += len(jobs)
+
+                all_endpoints = sum(len(endpoints) for endpoints in grouped.values())
+                logger.info(f"Probing {len(jobs)} more endpoints, {len(selected)} of {all_endpoints} unique so far")
+                return jobs
+
+        def feed():
+            for groups in batches:
+                yield plan(groups)
+
+        def on_result(endpoint, result):
+            nonlocal spent
+            with lock:
+                group = owner.get(endpoint)
+                pending.get(group, set()).discard(endpoint)
+                if self.quota is None or group is None or not result or not result.get('working'):
+                    return ()
+                working_endpoints.add(endpoint)
+                found[group] += len(grouped[group].get(endpoint, []))
+                if found[group] < self.quota or group in full:
+                    return ()
+                logger.info(f"Quota of {self.quota} working configs reached for {group}")
+                full.add(group)
+                cancelled = pending.pop(group, set())
+                # cancelled probes give their share of the budget back to later batches
+                spent -= len(cancelled)
+                return cancelled
+
+        results = self.engine.run_stream(feed(), time_budget, on_result)
+        for endpoint, result in results.items():
+            working = bool(result and result.get('working'))
+            METRICS.incr("endpoints_probed_total", kind=endpoint[2][0], outcome='working' if working else 'failed')
+            if working and result.get('latency_ms') is not None:
+                METRICS.record_time("endpoint_latency_seconds", result['latency_ms'] / 1000, kind=endpoint[2][0])
+        if self.probe_budget is not None:
+            self.probe_budget = max(self.probe_budget - len(results), 0)
+
+        if self.history is not None:
+            for endpoint in selected:
+                if endpoint in results:
+                    self.history.record(TestHistory.endpoint_key(endpoint), results[endpoint] or {})
+
+        working = {}
+        for group, endpoints in grouped.items():
+            group_results = results
+            if self.history is not None:
+                group_results = self._with_cached_results(endpoints, results)
+
+            for endpoint, members in endpoints.items():
+                result = group_results.get(endpoint)
+                if not result:
                     continue
-        
-        logger.info(f"{len(working_configs)} configs are working")
-        return working_configs
-    
-    def _test_single_config(self, config: Dict) -> Optional[Dict]:
-        """Test a single config by checking TCP connection"""
-        try:
-            address = config.get('address', '')
-            port = config.get('port', '')
-            
-            if not address or not port:
-                return None
-            
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(self.timeout)
-            
-            try:
-                result = sock.connect_ex((address, int(port)))
-                sock.close()
-                
-                if result == 0:
+                for config in members:
                     config['tested'] = True
-                    config['working'] = True
-                    return config
-                else:
-                    return None
-                    
-            except Exception as e:
-                sock.close()
-                return None
-                
+                    config['working'] = result['working']
+                    config['latency_ms'] = result['latency_ms']
+                    config['jitter_ms'] = result['jitter_ms']
+                    config['loss'] = result['loss']
+                    if self.history is not None:
+                        key = TestHistory.endpoint_key(endpoint)
+                        config['uptime'] = self.history.uptime(key)
+                        config['streak'] = (self.history.get(key) or {}).get('streak', 0)
+
+            # keep the input order so results don't depend on probe completion order
+            working[group] = [config for config in arrived[group] if config.get('working')]
+
+        logger.info(f"{sum(len(c) for c in working.values())} configs are working")
+        return working
+
+    def _prior_score(self, endpoint: tuple) -> float:
+        """How likely an endpoint is to work, used to order probes"""
+        if self.history is None:
+            return 0.5
+        return self.history.prior(TestHistory.endpoint_key(endpoint))
+
+    def _cached_working(self, endpoints: Dict[tuple, list], due: list) -> List[tuple]:
+        """Endpoints that won't be re-probed and worked last time"""
+        if self.history is None:
+            return []
+        due = set(due)
+        return [endpoint for endpoint in endpoints
+                if endpoint not in due
+                and (self.history.get(TestHistory.endpoint_key(endpoint)) or {}).get('last_result')]
+
+    def _due_endpoints(self, endpoints: list) -> list:
+        """Endpoints that need probing now, most overdue first (all of them without history)"""
+        if self.history is None:
+            return endpoints
+
+        keys = {TestHistory.endpoint_key(endpoint): endpoint for endpoint in endpoints}
+        return [keys[key] for key in self.history.schedule(list(keys))]
+
+    def _with_cached_results(self, endpoints: Dict[tuple, list], results: Dict) -> Dict:
+        """Fill in endpoints that weren't probed this run from their last known result"""
+        merged = dict(results)
+        for endpoint in endpoints:
+            if endpoint in merged:
+                continue
+            entry = self.history.get(TestHistory.endpoint_key(endpoint))
+            if entry and entry.get('last_result') is not None:
+                merged[endpoint] = {
+                    'working': entry['last_result'],
+                    'latency_ms': entry.get('latency_ms'),
+                    'jitter_ms': entry.get('jitter_ms'),
+                    'loss': entry.get('loss'),
+                }
+        return merged
+
+    def _group_by_endpoint(self, configs: list) -> Dict[tuple, list]:
+        """Group configs by endpoint, reusing the IP resolved by ConfigFilter
+
+        The key is (ip, port, probe) where probe is ('tcp',), ('udp',) or
+        ('tls', sni, alpn), so configs only share a probe when it is identical.
+        """
+        endpoints: Dict[tuple, list] = {}
+
+        for config in configs:
+            try:
+                host = config.get('ip') or config.get('address', '')
+                port = int(config.get('port', ''))
+            except (TypeError, ValueError):
+                continue
+            if not host:
+                continue
+            endpoints.setdefault((host, port, self._probe_kind(config)), []).append(config)
+
+        return endpoints
+
+    def _probe_kind(self, config: Dict) -> tuple:
+        """Pick the probe: QUIC for UDP protocols, TLS handshake for tls/reality configs, else TCP
+
+        An `sni` only implies TLS when the link doesn't say; an explicit
+        security=none is plaintext even if an sni param is left over.
+        """
+        if str(config.get('type', '')).lower() in UDP_PROTOCOLS:
+            return ('udp',)
+
+        if self.mode != 'auto':
+            return ('tcp',)
+
+        security = str(config.get('security', '') or '').lower()
+        sni = config.get('sni', '') or ''
+        if security not in ('tls', 'reality', 'xtls') and (security or not sni):
+            return ('tcp',)
+
+        if not sni:
+            for candidate in (config.get('host', ''), config.get('address', '')):
+                if candidate and not self._is_ip(candidate):
+                    sni = candidate
+                    break
+
+        alpn = tuple(a.strip() for a in str(config.get('alpn', '') or '').split(',') if a.strip())
+        return ('tls', sni, alpn)
+
+    @staticmethod
+    def _is_ip(value: str) -> bool:
+        try:
+            ipaddress.ip_address(value.strip('[]'))
+            return True
+        except ValueError:
+            return False
+
+    def _build_job(self, endpoint: tuple) -> Optional[tuple]:
+        """Build a probe job sampling the connect/handshake time of a single endpoint"""
+        try:
+            host, port, kind = endpoint
+
+            timeout = self.timeout
+            if kind[0] == 'udp':
+                timeout = self.udp_timeout
+                probe = lambda: udp_probe(host, port)
+            elif kind[0] == 'tls':
+                _, sni, alpn = kind
+                probe = lambda: tls_handshake(host, port, sni, list(alpn))
+            else:
+                probe = lambda: tcp_connect(host, port)
+
+            job_timeout = timeout * self.samples + 1
+            return (endpoint, host, job_timeout,
+                    lambda: sample_endpoint(probe, self.samples, timeout, self.max_loss))
+
         except Exception as e:
-            logger.debug(f"Error testing config: {e}")
+            logger.debug(f"Error testing endpoint {endpoint}: {e}")
             return None
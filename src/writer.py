@@ -0,0 +1,164 @@
+"""
+Writer module for atomic, skip-if-unchanged output files
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, Iterable, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # optional: .br siblings are skipped without it
+    brotli = None
+
+
+def compress(data: bytes, encoding: str) -> Optional[bytes]:
+    """Compress deterministically (no timestamp), or None if `encoding` is unavailable"""
+    if encoding == 'gz':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+class OutputWriter:
+    """Write output files through temp file + rename, skipping unchanged content
+
+    Content is compared by hash with what is already on disk. Volatile
+    parts (a JSON `updated` key, a README timestamp line) are ignored in
+    the comparison, so a file whose real content didn't change keeps its
+    old bytes and produces no diff.
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _count(self, written: bool):
+        with self._lock:
+            if written:
+                self.written += 1
+            else:
+                self.skipped += 1
+
+    def _replace(self, path: str, data: bytes):
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def write_bytes(self, path: str, data: bytes, compare_key: Optional[bytes] = None,
+                    existing_key=None) -> bool:
+        """Write `data` unless the file already holds equivalent content
+
+        `compare_key` / `existing_key(old_bytes)` let callers compare a
+        normalised form instead of the raw bytes. Returns True if written.
+        """
+        existing = self._read(path)
+        if existing is not None:
+            if existing_key is not None:
+                try:
+                    old_key = existing_key(existing)
+                except Exception:
+                    old_key = None
+            else:
+                old_key = existing
+            new_key = compare_key if compare_key is not None else data
+            if old_key is not None and self._digest(old_key) == self._digest(new_key):
+                self._count(False)
+                return False
+
+        self._replace(path, data)
+        self._count(True)
+        return True
+
+    def write_text(self, path: str, content: str, volatile_pattern: Optional[str] = None) -> bool:
+        """Write text; lines matching `volatile_pattern` are ignored when comparing"""
+        data = content.encode('utf-8')
+        if not volatile_pattern:
+            return self.write_bytes(path, data)
+
+        regex = re.compile(volatile_pattern, re.MULTILINE)
+        strip = lambda raw: regex.sub('', raw.decode('utf-8', errors='replace')).encode('utf-8')
+        return self.write_bytes(path, data, compare_key=strip(data), existing_key=strip)
+
+    def write_json(self, path: str, data: Dict, volatile_keys: Iterable[str] = ('updated',),
+                   volatile_item_keys: Iterable[str] = (), **dump_kwargs) -> bool:
+        """Write JSON, ignoring volatile fields when comparing
+
+        `volatile_keys` are top-level keys; `volatile_item_keys` are keys of
+        the objects inside top-level lists (e.g. per-config measurements).
+        """
+        dump_kwargs.setdefault('ensure_ascii', False)
+        rendered = json.dumps(data, **dump_kwargs).encode('utf-8')
+        volatile = set(volatile_keys)
+        volatile_items = set(volatile_item_keys)
+
+        def strip_item(item):
+            if isinstance(item, dict) and volatile_items:
+                return {k: v for k, v in item.items() if k not in volatile_items}
+            return item
+
+        def stable(obj) -> bytes:
+            if isinstance(obj, dict):
+                obj = {k: [strip_item(i) for i in v] if isinstance(v, list) else v
+                       for k, v in obj.items() if k not in volatile}
+            return json.dumps(obj, ensure_ascii=False, sort_keys=True,
+                              separators=(',', ':')).encode('utf-8')
+
+        return self.write_bytes(path, rendered, compare_key=stable(data),
+                                existing_key=lambda raw: stable(json.loads(raw)))
+
+    def write_precompressed(self, path: str, data: bytes, encodings: Iterable[str],
+                            changed: bool = True) -> int:
+        """Write `<path>.gz` / `<path>.br` siblings of `data` for static hosting
+
+        When the main file was left unchanged and a sibling already exists,
+        the sibling is kept without recompressing. Returns siblings written.
+        """
+        count = 0
+        for encoding in encodings:
+            sibling = f"{path}.{encoding}"
+            if not changed and os.path.exists(sibling):
+                self._count(False)
+                continue
+            compressed = compress(data, encoding)
+            if compressed is None:
+                logger.debug(f"Skipping {sibling}: no compressor for '{encoding}'")
+                continue
+            if self.write_bytes(sibling, compressed):
+                count += 1
+        return count
+
+    def report(self) -> str:
+        return f"{self.written} files written, {self.skipped} unchanged files skipped"